@@ -0,0 +1,56 @@
+"""Compare two benchmark results and fail on regressions.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.1]
+
+An endpoint regresses when its throughput drops, or its p95/p99 latency or database queries
+per request grow, by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Iterator, Tuple
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def changes(baseline: dict, candidate: dict) -> Iterator[Tuple[str, str, float, float, bool]]:
+    """Yield (name, metric, baseline value, candidate value, higher is better) for every shared metric"""
+    for operation in sorted(baseline["endpoints"].keys() & candidate["endpoints"].keys()):
+        old, new = baseline["endpoints"][operation], candidate["endpoints"][operation]
+        yield operation, "rps", old["rps"], new["rps"], True
+        for quantile in ("p95", "p99"):
+            yield operation, f"{quantile} ms", old["latency_ms"][quantile], new["latency_ms"][quantile], False
+    for route in sorted(baseline["db_queries_per_route"].keys() & candidate["db_queries_per_route"].keys()):
+        old, new = baseline["db_queries_per_route"][route], candidate["db_queries_per_route"][route]
+        yield route, "queries/request", old["queries_per_request"], new["queries_per_request"], False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change treated as a regression")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline["profile"] != candidate["profile"]:
+        print(f"warning: comparing profile {baseline['profile']} with {candidate['profile']}", file=sys.stderr)
+
+    regressions = 0
+    for name, metric, old, new, higher_is_better in changes(baseline, candidate):
+        change = (new - old) / old if old else 0.0
+        regressed = -change > args.threshold if higher_is_better else change > args.threshold
+        regressions += regressed
+        marker = "REGRESSION" if regressed else ""
+        print(f"{name:<40} {metric:<16} {old:>10.2f} -> {new:>10.2f} {change:>+8.1%} {marker}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Traffic profiles: the share of each operation in the request mix.
+
+Redirects and stats requests pick short codes with Zipfian popularity among the seeded
+links, so a small set of hot codes receives most of the traffic, as in production.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+
+OPERATIONS = ("redirect", "create", "stats", "search")
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    weights: Dict[str, float]
+    zipf_exponent: float = 1.1
+    description: str = field(default="", compare=False)
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        Profile(
+            "redirect-heavy",
+            {"redirect": 0.95, "stats": 0.03, "create": 0.01, "search": 0.01},
+            description="mostly redirects of popular links",
+        ),
+        Profile(
+            "create-burst",
+            {"create": 0.8, "redirect": 0.2},
+            description="bursts of new links with some redirects",
+        ),
+        Profile(
+            "stats-polling",
+            {"stats": 0.7, "redirect": 0.3},
+            description="dashboards polling stats of popular links",
+        ),
+        Profile(
+            "search",
+            {"search": 0.8, "redirect": 0.2},
+            description="domain and prefix searches over the seeded links",
+        ),
+        Profile(
+            "mixed",
+            {"redirect": 0.7, "create": 0.1, "stats": 0.1, "search": 0.1},
+            description="all operations at once",
+        ),
+    )
+}
@@ -0,0 +1,261 @@
+"""Replay a traffic profile against a running service and store the results as JSON.
+
+Usage:
+    python -m benchmarks.run --profile redirect-heavy [--duration 60] [--concurrency 64]
+                             [--base-url http://localhost:8000] [--hot-set 100000] [--output DIR]
+                             [--api-key KEY]
+
+Short codes are read from links created by `benchmarks.seed`. Latencies are measured on the
+client with the monotonic clock; database query counts per endpoint come from the difference
+of the service's /metrics before and after the run, so the run should not share the service
+with other traffic.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence, Tuple
+
+import asyncpg
+import httpx
+
+from benchmarks.profiles import OPERATIONS, PROFILES, Profile
+from benchmarks.seed import BENCH_DOMAIN
+from service.core.config import settings
+from service.db.asyncpg_pool import asyncpg_dsn
+from service.db.postgres import shards
+
+
+API = "/api/v1/links"
+METRIC_LINE = re.compile(r"^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$")
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class ZipfSampler:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** exponent"""
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+    def sample(self) -> int:
+        return bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def percentile(values: Sequence[float], share: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    samples = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            labels = tuple(LABEL.findall(match["labels"] or ""))
+            samples[(match["name"], labels)] = float(match["value"])
+    return samples
+
+
+def queries_per_route(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Mean database queries per request of each route, from two /metrics snapshots"""
+    routes = {}
+    for (name, labels), value in after.items():
+        if name != "db_queries_per_request_count":
+            continue
+        requests = value - before.get((name, labels), 0.0)
+        if requests <= 0:
+            continue
+        queries = after[("db_queries_per_request_sum", labels)] - before.get(
+            ("db_queries_per_request_sum", labels), 0.0
+        )
+        label_values = dict(labels)
+        routes[f"{label_values['method']} {label_values['route']}"] = {
+            "requests": requests,
+            "queries": queries,
+            "queries_per_request": queries / requests,
+        }
+    return routes
+
+
+async def load_short_codes(hot_set: int, rng: random.Random) -> List[str]:
+    rows = []
+    for url in shards.urls:
+        conn = await asyncpg.connect(asyncpg_dsn(url))
+        try:
+            rows += await conn.fetch(
+                "SELECT id, short_code FROM links WHERE host LIKE $1 ORDER BY id LIMIT $2",
+                f"%.{BENCH_DOMAIN}",
+                hot_set,
+            )
+        finally:
+            await conn.close()
+    short_codes = [short_code for _, short_code in sorted(rows, key=lambda row: row[0])[:hot_set]]
+    rng.shuffle(short_codes)
+    return short_codes
+
+
+class Runner:
+    def __init__(self, args: argparse.Namespace, profile: Profile, short_codes: List[str]):
+        self.args = args
+        self.profile = profile
+        self.short_codes = short_codes
+        self.rng = random.Random(args.seed)
+        self.codes = ZipfSampler(len(short_codes), profile.zipf_exponent, self.rng)
+        self.domains = ZipfSampler(args.domains, profile.zipf_exponent, self.rng)
+        self.operations = [operation for operation in OPERATIONS if profile.weights.get(operation)]
+        self.weights = [profile.weights[operation] for operation in self.operations]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def _request(self, operation: str) -> Tuple[str, str, dict]:
+        if operation == "redirect":
+            return "GET", f"{API}/{self.short_codes[self.codes.sample()]}", {}
+        if operation == "stats":
+            return "GET", f"{API}/{self.short_codes[self.codes.sample()]}/stats", {}
+        if operation == "create":
+            url = f"https://d{self.domains.sample()}.{BENCH_DOMAIN}/new/{uuid.uuid4().hex}"
+            return "POST", f"{API}/shorten", {"json": {"original_url": url}}
+        domain = f"d{self.domains.sample()}.{BENCH_DOMAIN}"
+        if self.rng.random() < 0.5:
+            return "GET", f"{API}/search", {"params": {"domain": domain, "limit": 50}}
+        return "GET", f"{API}/search", {"params": {"prefix": f"https://{domain}/page/1", "limit": 50}}
+
+    async def _worker(self, client: httpx.AsyncClient, deadline: float) -> None:
+        while time.monotonic() < deadline:
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            method, url, kwargs = self._request(operation)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            elapsed = time.perf_counter() - started
+            if self.recording:
+                self.latencies[operation].append(elapsed)
+                self.statuses[operation][status] += 1
+
+    async def run(self, client: httpx.AsyncClient) -> float:
+        deadline = time.monotonic() + self.args.warmup + self.args.duration
+        workers = [asyncio.create_task(self._worker(client, deadline)) for _ in range(self.args.concurrency)]
+        await asyncio.sleep(self.args.warmup)
+        self.recording = True
+        started = time.monotonic()
+        await asyncio.gather(*workers)
+        return time.monotonic() - started
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        endpoints = {}
+        for operation, latencies in self.latencies.items():
+            latencies.sort()
+            statuses = self.statuses[operation]
+            endpoints[operation] = {
+                "requests": len(latencies),
+                "rps": len(latencies) / elapsed,
+                "errors": sum(count for status, count in statuses.items() if status == 0 or status >= 500),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "latency_ms": {
+                    "mean": 1000 * sum(latencies) / len(latencies),
+                    "p50": 1000 * percentile(latencies, 0.50),
+                    "p95": 1000 * percentile(latencies, 0.95),
+                    "p99": 1000 * percentile(latencies, 0.99),
+                    "max": 1000 * latencies[-1],
+                },
+            }
+        return endpoints
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args: argparse.Namespace) -> None:
+    profile = PROFILES[args.profile]
+    short_codes = await load_short_codes(args.hot_set, random.Random(args.seed))
+    if not short_codes:
+        sys.exit("No benchmark links found, run python -m benchmarks.seed first")
+
+    runner = Runner(args, profile, short_codes)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {settings.RATE_LIMIT_API_KEY_HEADER: args.api_key} if args.api_key else {}
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout, headers=headers
+    ) as client:
+        before = parse_metrics((await client.get("/metrics")).text)
+        elapsed = await runner.run(client)
+        after = parse_metrics((await client.get("/metrics")).text)
+
+    endpoints = runner.report(elapsed)
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    db_queries = after.get(("db_query_duration_seconds_count", ()), 0.0) - before.get(
+        ("db_query_duration_seconds_count", ()), 0.0
+    )
+    result = {
+        "profile": profile.name,
+        "weights": profile.weights,
+        "zipf_exponent": profile.zipf_exponent,
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "duration": elapsed,
+        "concurrency": args.concurrency,
+        "hot_set": len(short_codes),
+        "seed": args.seed,
+        "total": {"requests": total, "rps": total / elapsed, "db_queries": db_queries},
+        "endpoints": endpoints,
+        "db_queries_per_route": queries_per_route(before, after),
+    }
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now():%Y%m%d-%H%M%S}-{profile.name}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{'endpoint':<10} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for operation, endpoint in sorted(endpoints.items()):
+        latency = endpoint["latency_ms"]
+        print(
+            f"{operation:<10} {endpoint['rps']:>9.1f} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+            f"{latency['p99']:>8.2f} {endpoint['errors']:>7}"
+        )
+    print(f"total {total / elapsed:.1f} rps, {db_queries / max(total, 1):.2f} queries per request, saved to {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="redirect-heavy")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unrecorded traffic before measuring")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--hot-set", type=int, default=100_000, help="number of seeded links to draw codes from")
+    parser.add_argument("--domains", type=int, default=1000, help="number of hosts used by the seed")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--api-key", default=None, help="key from RATE_LIMIT_API_KEYS to run under its limits")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "results"))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
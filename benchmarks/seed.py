@@ -0,0 +1,78 @@
+"""Seed the database with links for benchmarks.
+
+Usage:
+    python -m benchmarks.seed --links 1000000 [--batch-size 50000] [--domains 1000]
+
+Links point to https://d<N>.bench.example/<path> so that they can be told apart from real data
+and searched by domain. Short codes come from the same allocator as the service uses; like
+`python -m service.tools.links import`, each link goes to the shard its short code belongs to and
+its code is added to the short code filter.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from service.cache.code_filter import short_code_filter
+from service.common.shortcode_generator import ShortCodeAllocator
+from service.common.url_normalizer import url_digest, url_host
+from service.db.postgres import shards
+from service.db.redis import redis_client
+from service.tools.links import connect_shards
+
+
+BENCH_DOMAIN = "bench.example"
+COLUMNS = ["short_code", "original_url", "original_url_hash", "host"]
+
+
+def bench_url(rng: random.Random, domains: int, index: int) -> str:
+    return f"https://d{rng.randrange(domains)}.{BENCH_DOMAIN}/page/{index}?ref={rng.randrange(1000)}"
+
+
+async def seed(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    allocator = ShortCodeAllocator(block_size=args.batch_size)
+    connections = await connect_shards()
+
+    async def reserve(count: int):
+        rows = await connections[0].fetch("SELECT nextval('short_code_id_seq') FROM generate_series(1, $1)", count)
+        return [row[0] for row in rows]
+
+    started = time.monotonic()
+    try:
+        written = 0
+        while written < args.links:
+            count = min(args.batch_size, args.links - written)
+            codes = await allocator.allocate_many(reserve, count)
+            by_shard = {}
+            for offset, code in enumerate(codes):
+                url = bench_url(rng, args.domains, written + offset)
+                by_shard.setdefault(shards.shard_of(code), []).append((code, url, url_digest(url), url_host(url)))
+            for shard, rows in by_shard.items():
+                await connections[shard].copy_records_to_table("links", records=rows, columns=COLUMNS)
+            if short_code_filter is not None:
+                await short_code_filter.add(codes)
+            written += count
+            rate = written / max(time.monotonic() - started, 1e-9)
+            print(f"seeded {written}/{args.links} links ({rate:.0f} rows/s)", file=sys.stderr)
+        for conn in connections:
+            await conn.execute("ANALYZE links")
+    finally:
+        for conn in connections:
+            await conn.close()
+        await redis_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed")
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--domains", type=int, default=1000, help="number of distinct hosts")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
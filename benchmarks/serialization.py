@@ -0,0 +1,165 @@
+"""Measure the CPU spent building and serializing link responses, without a database.
+
+Usage:
+    python -m benchmarks.serialization [--number 2000] [--search-size 500]
+
+`validated` reproduces the former path: response models built with HttpUrl parsing, FastAPI's
+response_model round trip and the stdlib JSON encoder. `trusted` is the current path: models
+built with model_construct and rendered by FastJSONResponse.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Coroutine, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import HttpUrl
+
+from service.api.responses import FastJSONResponse
+from service.models.domain.link import Link
+from service.models.schemas.link import LinkResponse, LinkSearchResponse, LinkStats
+from service.services.link_service import _link_response
+
+
+class ValidatedLinkResponse(LinkResponse):
+    original_url: HttpUrl
+
+
+class ValidatedLinkStats(LinkStats):
+    original_url: HttpUrl
+
+
+class ValidatedLinkSearchResponse(LinkSearchResponse):
+    links: List[ValidatedLinkResponse]
+
+
+def make_links(count: int) -> List[Link]:
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        Link(
+            id=index,
+            short_code=f"c{index:07d}",
+            original_url=f"https://d{index % 1000}.bench.example/page/{index}?utm_source=bench",
+            custom_alias=False,
+            created_at=created_at + timedelta(seconds=index),
+            expires_at=created_at + timedelta(days=30),
+        )
+        for index in range(count)
+    ]
+
+
+def validated_link(link: Link) -> ValidatedLinkResponse:
+    return ValidatedLinkResponse(
+        short_code=link.short_code,
+        original_url=HttpUrl(link.original_url),
+        created_at=link.created_at,
+        expires_at=link.expires_at,
+        custom_alias=link.custom_alias,
+        redirect_type=link.redirect_type,
+    )
+
+
+def validated_stats(link: Link) -> ValidatedLinkStats:
+    return ValidatedLinkStats(
+        short_code=link.short_code,
+        original_url=HttpUrl(link.original_url),
+        created_at=link.created_at,
+        visit_count=42,
+        first_visited_at=link.created_at,
+        last_visited_at=link.created_at,
+    )
+
+
+def trusted_stats(link: Link) -> LinkStats:
+    return LinkStats.model_construct(
+        short_code=link.short_code,
+        original_url=link.original_url,
+        created_at=link.created_at,
+        visit_count=42,
+        first_visited_at=link.created_at,
+        last_visited_at=link.created_at,
+    )
+
+
+def complete(coroutine: Coroutine) -> Any:
+    """Run a coroutine that never suspends, without the cost of an event loop"""
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("Coroutine suspended")
+
+
+def validated_path(model: type, build: Callable[[], object]) -> Callable[[], bytes]:
+    field = create_model_field("response", model, mode="serialization")
+
+    def run() -> bytes:
+        content = complete(serialize_response(field=field, response_content=build()))
+        return JSONResponse(content).body
+
+    return run
+
+
+def trusted_path(build: Callable[[], object]) -> Callable[[], bytes]:
+    return lambda: FastJSONResponse(build()).body
+
+
+def measure(run: Callable[[], bytes], number: int) -> float:
+    """Mean process CPU time of one call, in microseconds"""
+    run()
+    started = time.process_time()
+    for _ in range(number):
+        run()
+    return (time.process_time() - started) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--number", type=int, default=2000, help="calls per scenario")
+    parser.add_argument("--search-size", type=int, default=500, help="links in the search response")
+    args = parser.parse_args()
+
+    link = make_links(1)[0]
+    page = make_links(args.search_size)
+    scenarios: Dict[str, tuple] = {
+        "create": (
+            validated_path(ValidatedLinkResponse, lambda: validated_link(link)),
+            trusted_path(lambda: _link_response(link)),
+            args.number,
+        ),
+        "stats": (
+            validated_path(ValidatedLinkStats, lambda: validated_stats(link)),
+            trusted_path(lambda: trusted_stats(link)),
+            args.number,
+        ),
+        f"search x{args.search_size}": (
+            validated_path(
+                ValidatedLinkSearchResponse,
+                lambda: ValidatedLinkSearchResponse(links=[validated_link(row) for row in page], domain="bench"),
+            ),
+            trusted_path(
+                lambda: LinkSearchResponse.model_construct(
+                    original_url=None,
+                    domain="bench",
+                    prefix=None,
+                    links=[_link_response(row) for row in page],
+                    next_cursor=None,
+                )
+            ),
+            max(1, args.number // args.search_size * 10),
+        ),
+    }
+
+    print(f"{'scenario':<14} {'validated us':>13} {'trusted us':>11} {'speedup':>8}")
+    for name, (validated, trusted, number) in scenarios.items():
+        if validated() != trusted():
+            raise SystemExit(f"{name}: responses differ")
+        before, after = measure(validated, number), measure(trusted, number)
+        print(f"{name:<14} {before:>13.1f} {after:>11.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
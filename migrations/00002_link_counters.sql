@@ -0,0 +1,20 @@
+-- +goose Up
+-- +goose StatementBegin
+CREATE TABLE link_counters
+(
+    link_id          INTEGER PRIMARY KEY REFERENCES links (id) ON DELETE CASCADE,
+    visit_count      BIGINT NOT NULL DEFAULT 0,
+    first_visited_at TIMESTAMP WITH TIME ZONE,
+    last_visited_at  TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO link_counters (link_id, visit_count, first_visited_at, last_visited_at)
+SELECT link_id, COUNT(*), MIN(visited_at), MAX(visited_at)
+FROM link_visits
+GROUP BY link_id;
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+DROP TABLE link_counters;
+-- +goose StatementEnd
@@ -0,0 +1,134 @@
+-- +goose Up
+-- +goose StatementBegin
+CREATE FUNCTION create_link_visits_partitions(from_day DATE, days INTEGER) RETURNS INTEGER AS
+$$
+DECLARE
+    day            DATE;
+    partition_name TEXT;
+    created        INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('link_visits_partitions'));
+
+    FOR i IN 0 .. days - 1
+        LOOP
+            day := from_day + i;
+            partition_name := format('link_visits_p%s', to_char(day, 'YYYYMMDD'));
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF link_visits FOR VALUES FROM (%L) TO (%L)',
+                        partition_name,
+                        day::TIMESTAMP AT TIME ZONE 'UTC',
+                        (day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+                        );
+                created := created + 1;
+            END IF;
+        END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION drop_link_visits_partitions(before_day DATE) RETURNS INTEGER AS
+$$
+DECLARE
+    partition_name TEXT;
+    dropped        INTEGER := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('link_visits_partitions'));
+
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+                 JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                 JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE parent.relname = 'link_visits'
+          AND child.relname ~ '^link_visits_p[0-9]{8}$'
+          AND to_date(substring(child.relname FROM 14), 'YYYYMMDD') < before_day
+        LOOP
+            EXECUTE format('DROP TABLE %I', partition_name);
+            dropped := dropped + 1;
+        END LOOP;
+
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE link_visits RENAME TO link_visits_legacy;
+ALTER TABLE link_visits_legacy RENAME CONSTRAINT link_visits_pkey TO link_visits_legacy_pkey;
+
+CREATE TABLE link_visits
+(
+    id         BIGSERIAL,
+    link_id    INTEGER                  NOT NULL REFERENCES links (id) ON DELETE CASCADE,
+    visited_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    user_agent TEXT,
+    ip_address VARCHAR(45),
+    referrer   TEXT,
+    PRIMARY KEY (id, visited_at)
+) PARTITION BY RANGE (visited_at);
+
+SELECT create_link_visits_partitions(
+               first_day,
+               (CURRENT_DATE - first_day) + 8
+       )
+FROM (SELECT COALESCE(MIN(visited_at AT TIME ZONE 'UTC')::DATE, CURRENT_DATE) AS first_day
+      FROM link_visits_legacy) AS bounds;
+
+INSERT INTO link_visits (id, link_id, visited_at, user_agent, ip_address, referrer)
+SELECT id, link_id, visited_at, user_agent, ip_address, referrer
+FROM link_visits_legacy;
+
+SELECT setval(pg_get_serial_sequence('link_visits', 'id'), COALESCE(MAX(id), 0) + 1, FALSE)
+FROM link_visits;
+
+DROP TABLE link_visits_legacy;
+
+CREATE INDEX idx_link_visits_link_id ON link_visits (link_id, visited_at);
+
+CREATE TABLE link_visits_hourly
+(
+    link_id          INTEGER                  NOT NULL REFERENCES links (id) ON DELETE CASCADE,
+    bucket           TIMESTAMP WITH TIME ZONE NOT NULL,
+    visit_count      BIGINT                   NOT NULL DEFAULT 0,
+    first_visited_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_visited_at  TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (link_id, bucket)
+);
+
+INSERT INTO link_visits_hourly (link_id, bucket, visit_count, first_visited_at, last_visited_at)
+SELECT link_id, date_trunc('hour', visited_at, 'UTC'), COUNT(*), MIN(visited_at), MAX(visited_at)
+FROM link_visits
+GROUP BY link_id, date_trunc('hour', visited_at, 'UTC');
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+DROP TABLE link_visits_hourly;
+
+ALTER TABLE link_visits RENAME TO link_visits_partitioned;
+ALTER TABLE link_visits_partitioned RENAME CONSTRAINT link_visits_pkey TO link_visits_partitioned_pkey;
+ALTER INDEX idx_link_visits_link_id RENAME TO idx_link_visits_partitioned_link_id;
+
+CREATE TABLE link_visits
+(
+    id         SERIAL PRIMARY KEY,
+    link_id    INTEGER                  NOT NULL REFERENCES links (id) ON DELETE CASCADE,
+    visited_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    user_agent TEXT,
+    ip_address VARCHAR(45),
+    referrer   TEXT
+);
+
+INSERT INTO link_visits (link_id, visited_at, user_agent, ip_address, referrer)
+SELECT link_id, visited_at, user_agent, ip_address, referrer
+FROM link_visits_partitioned
+ORDER BY id;
+
+DROP TABLE link_visits_partitioned;
+
+CREATE INDEX idx_link_visits_link_id ON link_visits (link_id);
+CREATE INDEX idx_link_visits_visited_at ON link_visits (visited_at);
+
+DROP FUNCTION drop_link_visits_partitions(DATE);
+DROP FUNCTION create_link_visits_partitions(DATE, INTEGER);
+-- +goose StatementEnd
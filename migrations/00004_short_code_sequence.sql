@@ -0,0 +1,9 @@
+-- +goose Up
+-- +goose StatementBegin
+CREATE SEQUENCE short_code_id_seq AS BIGINT MINVALUE 0 START WITH 0;
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+DROP SEQUENCE short_code_id_seq;
+-- +goose StatementEnd
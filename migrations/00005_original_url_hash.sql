@@ -0,0 +1,64 @@
+-- +goose Up
+-- +goose StatementBegin
+ALTER TABLE links ADD COLUMN original_url_hash BYTEA;
+
+-- Same normalization as service.common.url_normalizer.normalize_url, for links stored so far
+CREATE FUNCTION normalize_url_00005(url TEXT) RETURNS TEXT AS $$
+DECLARE
+    parts TEXT[] := regexp_match(url, '^([^:/?#]+)://([^/?#]*)([^?#]*)(?:\?([^#]*))?(?:#(.*))?$');
+    scheme TEXT := lower(parts[1]);
+    hostport TEXT := regexp_replace(parts[2], '^.*@', '');
+    userinfo TEXT := substring(parts[2] FROM '^(.*)@');
+    host TEXT;
+    port TEXT;
+    default_port INTEGER;
+    query TEXT;
+BEGIN
+    IF parts IS NULL THEN
+        RETURN url;
+    END IF;
+
+    IF position('[' IN hostport) > 0 THEN
+        host := split_part(split_part(hostport, '[', 2), ']', 1);
+        port := substring(split_part(split_part(hostport, '[', 2), ']', 2) FROM ':(.*)$');
+    ELSE
+        host := split_part(hostport, ':', 1);
+        port := substring(hostport FROM ':(.*)$');
+    END IF;
+    host := lower(host);
+    IF position(':' IN host) > 0 THEN
+        host := '[' || host || ']';
+    END IF;
+    default_port := CASE scheme WHEN 'http' THEN 80 WHEN 'https' THEN 443 END;
+    IF port <> '' AND port::INTEGER IS DISTINCT FROM default_port THEN
+        host := host || ':' || port::INTEGER;
+    END IF;
+
+    SELECT string_agg(param, '&' ORDER BY split_part(param, '=', 1) COLLATE "C", ordinal)
+    INTO query
+    FROM unnest(string_to_array(parts[4], '&')) WITH ORDINALITY AS p (param, ordinal)
+    WHERE param <> '';
+
+    RETURN scheme || '://' || COALESCE(NULLIF(userinfo, '') || '@', '') || host || rtrim(parts[3], '/')
+        || COALESCE('?' || NULLIF(query, ''), '') || COALESCE('#' || NULLIF(parts[5], ''), '');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+UPDATE links
+SET original_url_hash = substring(sha256(convert_to(normalize_url_00005(original_url), 'UTF8')) FROM 1 FOR 16);
+
+DROP FUNCTION normalize_url_00005(TEXT);
+
+CREATE INDEX idx_links_original_url_hash ON links USING hash (original_url_hash);
+
+DROP INDEX idx_links_original_url;
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+CREATE INDEX idx_links_original_url ON links (original_url);
+
+DROP INDEX idx_links_original_url_hash;
+
+ALTER TABLE links DROP COLUMN original_url_hash;
+-- +goose StatementEnd
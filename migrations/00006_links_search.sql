@@ -0,0 +1,18 @@
+-- +goose Up
+-- +goose StatementBegin
+ALTER TABLE links ADD COLUMN host TEXT;
+
+UPDATE links
+SET host = btrim(lower(substring(original_url FROM '^[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?(\[[^]]*\]|[^:/?#]*)')), '[]');
+
+CREATE INDEX idx_links_host ON links (host, created_at, id);
+CREATE INDEX idx_links_original_url_prefix ON links (left(original_url, 512) text_pattern_ops);
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+DROP INDEX idx_links_original_url_prefix;
+DROP INDEX idx_links_host;
+
+ALTER TABLE links DROP COLUMN host;
+-- +goose StatementEnd
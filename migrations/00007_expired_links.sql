@@ -0,0 +1,25 @@
+-- +goose Up
+-- +goose StatementBegin
+CREATE TABLE expired_links
+(
+    id                INTEGER PRIMARY KEY,
+    short_code        VARCHAR(16)              NOT NULL,
+    original_url      TEXT                     NOT NULL,
+    original_url_hash BYTEA,
+    host              TEXT,
+    custom_alias      BOOLEAN                  NOT NULL,
+    created_at        TIMESTAMP WITH TIME ZONE NOT NULL,
+    expires_at        TIMESTAMP WITH TIME ZONE NOT NULL,
+    expired_at        TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    visit_count       BIGINT                   NOT NULL DEFAULT 0,
+    last_visited_at   TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_expired_links_expired_at ON expired_links (expired_at, id);
+CREATE INDEX idx_expired_links_short_code ON expired_links (short_code);
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+DROP TABLE expired_links;
+-- +goose StatementEnd
@@ -0,0 +1,11 @@
+-- +goose Up
+-- +goose StatementBegin
+ALTER TABLE links
+    ADD COLUMN redirect_type SMALLINT NOT NULL DEFAULT 307
+        CONSTRAINT links_redirect_type_check CHECK (redirect_type IN (301, 302, 307, 308));
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+ALTER TABLE links DROP COLUMN redirect_type;
+-- +goose StatementEnd
@@ -0,0 +1,21 @@
+-- +goose Up
+-- +goose StatementBegin
+ALTER SEQUENCE links_id_seq AS BIGINT;
+
+ALTER TABLE links ALTER COLUMN id TYPE BIGINT;
+ALTER TABLE link_visits ALTER COLUMN link_id TYPE BIGINT;
+ALTER TABLE link_visits_hourly ALTER COLUMN link_id TYPE BIGINT;
+ALTER TABLE link_counters ALTER COLUMN link_id TYPE BIGINT;
+ALTER TABLE expired_links ALTER COLUMN id TYPE BIGINT;
+-- +goose StatementEnd
+
+-- +goose Down
+-- +goose StatementBegin
+ALTER TABLE expired_links ALTER COLUMN id TYPE INTEGER;
+ALTER TABLE link_counters ALTER COLUMN link_id TYPE INTEGER;
+ALTER TABLE link_visits_hourly ALTER COLUMN link_id TYPE INTEGER;
+ALTER TABLE link_visits ALTER COLUMN link_id TYPE INTEGER;
+ALTER TABLE links ALTER COLUMN id TYPE INTEGER;
+
+ALTER SEQUENCE links_id_seq AS INTEGER;
+-- +goose StatementEnd
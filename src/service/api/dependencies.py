@@ -1,14 +1,64 @@
-from fastapi import Depends
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Callable, List, Optional
+
+from fastapi import Depends, Request
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from service.db.postgres import get_db
-from service.repositories.links import LinkRepository
+from service.cache.code_filter import short_code_filter
+from service.cache.link_cache import LinkCache, local_link_cache, recent_link_writes
+from service.cache.visitor_counter import unique_visitors
+from service.core.config import settings
+from service.db.asyncpg_pool import asyncpg_pools
+from service.db.postgres import get_db, get_read_db, get_shard_dbs, wrote_recently
+from service.db.redis import get_redis
+from service.repositories.links import (
+    AsyncpgLinkRepository,
+    LinkRepository,
+    ShardedLinkRepository,
+    open_link_repository,
+)
 from service.services.link_service import LinkService
+from service.workers.visit_buffer import visit_buffer
+
+
+def get_link_repository(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+    shard_dbs: List[AsyncSession] = Depends(get_shard_dbs),
+) -> LinkRepository:
+    if settings.LINK_REPOSITORY == "asyncpg":
+        read_pool = asyncpg_pools.primary if wrote_recently(request) else asyncpg_pools.for_read()
+        repository = AsyncpgLinkRepository(db, read_db, asyncpg_pools.primary, read_pool)
+    else:
+        repository = LinkRepository(db, read_db)
+    if shard_dbs:
+        return ShardedLinkRepository([repository, *(LinkRepository(shard_db) for shard_db in shard_dbs)])
+    return repository
+
+
+def get_link_cache(redis: Redis = Depends(get_redis)) -> Optional[LinkCache]:
+    if not settings.LINK_CACHE_ENABLED:
+        return None
+    return LinkCache(redis, local_link_cache, recent_writes=recent_link_writes)
+
+
+def get_link_service(
+    repository: LinkRepository = Depends(get_link_repository),
+    cache: Optional[LinkCache] = Depends(get_link_cache),
+) -> LinkService:
+    return LinkService(repository, cache, visit_buffer, short_code_filter, unique_visitors)
 
 
-def get_link_repository(db: AsyncSession = Depends(get_db)) -> LinkRepository:
-    return LinkRepository(db)
+def get_streaming_link_service(
+    cache: Optional[LinkCache] = Depends(get_link_cache),
+) -> Callable[[], AsyncContextManager[LinkService]]:
+    """Provide link services with their own database session, for responses streamed after the endpoint returns"""
 
+    @asynccontextmanager
+    async def open_link_service() -> AsyncIterator[LinkService]:
+        async with open_link_repository() as repository:
+            yield LinkService(repository, cache, visit_buffer, short_code_filter, unique_visitors)
 
-def get_link_service(repository: LinkRepository = Depends(get_link_repository)) -> LinkService:
-    return LinkService(repository)
+    return open_link_service
@@ -0,0 +1,72 @@
+from typing import Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from service.api.dependencies import get_link_cache, get_link_repository, get_link_service
+from service.api.responses import redirect_response
+from service.core.config import settings
+from service.core.exceptions import URLShortenerException
+from service.db.postgres import async_session, open_read_session, open_shard_sessions
+from service.db.redis import redis_client
+
+
+class RedirectFastLane:
+    """Serves GET /links/{short_code} redirects without FastAPI routing and dependency injection.
+
+    Matching requests build the same LinkService the route would get and answer with the same
+    redirect or error body; everything else, including reserved paths such as /links/search
+    and requests with an Origin header that need CORS handling, goes to the wrapped app. With
+    `host_mode` bare /{short_code} paths are redirected as well.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Iterable[BaseRoute], host_mode: bool = settings.REDIRECT_HOST_MODE):
+        self.app = app
+        self.prefix = f"{settings.API_PREFIX}/links/"
+        self.host_mode = host_mode
+        self.route: Optional[BaseRoute] = None
+        self.reserved = set()
+        self.reserved_root = set()
+        for route in routes:
+            if route.path == f"{self.prefix}{{short_code}}" and "GET" in getattr(route, "methods", ()):
+                self.route = route
+            elif route.path.startswith(self.prefix):
+                self.reserved.add(route.path[len(self.prefix) :])
+            else:
+                self.reserved_root.add(route.path[1:])
+
+    def _short_code(self, path: str) -> Optional[str]:
+        if path.startswith(self.prefix):
+            short_code = path[len(self.prefix) :]
+            reserved = self.reserved
+        elif self.host_mode:
+            short_code = path[1:]
+            reserved = self.reserved_root
+        else:
+            return None
+        if not short_code or "/" in short_code or short_code in reserved:
+            return None
+        return short_code
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        short_code = None
+        if scope["type"] == "http" and scope["method"] == "GET":
+            short_code = self._short_code(scope["path"])
+        if short_code is None or any(name == b"origin" for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        if self.route is not None:
+            scope["route"] = self.route
+        request = Request(scope, receive)
+        async with async_session() as db, open_read_session(request, db) as read_db, open_shard_sessions() as shard_dbs:
+            link_service = get_link_service(
+                get_link_repository(request, db, read_db, shard_dbs), get_link_cache(redis_client)
+            )
+            try:
+                response = redirect_response(await link_service.get_redirect_link(short_code, request))
+            except URLShortenerException as e:
+                response = JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+        await response(scope, receive, send)
@@ -0,0 +1,86 @@
+from typing import Iterable, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from service.cache.code_filter import short_code_filter
+from service.cache.link_cache import local_link_cache
+from service.core.metrics import CallbackMetric, LabelValues, registry
+from service.db.asyncpg_pool import asyncpg_pools
+from service.db.postgres import engine, replicas
+from service.workers.visit_buffer import visit_buffer
+
+
+router = APIRouter(tags=["Metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _engines():
+    yield "primary", engine
+    for index, replica_engine in enumerate(replicas.engines):
+        yield f"replica{index}", replica_engine
+
+
+def _pool_stats() -> Iterable[Tuple[LabelValues, float]]:
+    for name, pool_engine in _engines():
+        pool = pool_engine.pool
+        for stat in ("size", "checkedout", "overflow"):
+            method = getattr(pool, stat, None)
+            if method is not None:
+                yield (name, stat), method()
+
+
+def _asyncpg_pool_stats() -> Iterable[Tuple[LabelValues, float]]:
+    for name, pool in asyncpg_pools.named_pools():
+        yield (name, "size"), pool.get_size()
+        yield (name, "idle"), pool.get_idle_size()
+
+
+def _replica_lag() -> Iterable[Tuple[LabelValues, float]]:
+    for index, lag in enumerate(replicas.lag):
+        if lag is not None:
+            yield (f"replica{index}",), lag
+
+
+def _local_cache_stats() -> Iterable[Tuple[LabelValues, float]]:
+    if local_link_cache is not None:
+        for name, value in local_link_cache.stats().items():
+            yield (name,), value
+
+
+def _code_filter_stats() -> Iterable[Tuple[LabelValues, float]]:
+    if short_code_filter is not None:
+        for name, value in short_code_filter.stats():
+            yield (name,), value
+
+
+def _visit_buffer_stats() -> Iterable[Tuple[LabelValues, float]]:
+    yield ("depth",), visit_buffer.depth
+    yield ("written",), visit_buffer.written
+    yield ("dropped",), visit_buffer.dropped
+    yield ("failed",), visit_buffer.failed
+
+
+registry.register(
+    CallbackMetric("db_pool_connections", "SQLAlchemy connection pool state", _pool_stats, ("pool", "state"))
+)
+registry.register(
+    CallbackMetric("asyncpg_pool_connections", "asyncpg connection pool state", _asyncpg_pool_stats, ("pool", "state"))
+)
+registry.register(CallbackMetric("db_replica_lag_seconds", "Last measured replication lag", _replica_lag, ("replica",)))
+registry.register(
+    CallbackMetric("local_link_cache", "Local link cache size and counters", _local_cache_stats, ("stat",))
+)
+registry.register(
+    CallbackMetric(
+        "short_code_filter", "Short code filter size, fill and false positive rate", _code_filter_stats, ("stat",)
+    )
+)
+registry.register(CallbackMetric("visit_buffer", "Visit buffer depth and counters", _visit_buffer_stats, ("stat",)))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,56 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from service.core.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    RequestQueries,
+    current_request_queries,
+)
+
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Records latency, status and database query count of every HTTP request.
+
+    Requests are labelled by the path template of the matched route rather than the actual
+    path, so the number of series stays bounded. The time to the response start is also
+    returned in the X-Process-Time header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = RequestQueries()
+        token = current_request_queries.set(queries)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = str(time.perf_counter() - started).encode()
+                message["headers"] = [*message.get("headers", ()), (b"x-process-time", elapsed)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - started
+            current_request_queries.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, path).observe(duration)
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
+            DB_QUERIES_PER_REQUEST.labels(method, path).observe(queries.count)
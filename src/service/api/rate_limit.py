@@ -0,0 +1,139 @@
+import hashlib
+import math
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from service.cache.local_cache import LocalCache
+from service.cache.rate_limiter import RateLimiter
+from service.core.config import RateLimit, settings
+from service.core.metrics import RATE_LIMITED
+from service.db.redis import redis_client
+
+
+class RateLimitMiddleware:
+    """Rejects requests over the token-bucket limits of their route with 429 and Retry-After.
+
+    Limits are keyed by "METHOD path template" in RATE_LIMITS and apply per client address,
+    or per API key for requests carrying one of RATE_LIMIT_API_KEYS. Limits with `statuses`
+    are charged after the response instead: a client whose bucket ran dry is remembered by
+    this worker and turned away before reaching the app until the bucket refills.
+
+    Routes are resolved by a lookup built once: exact paths of routes without parameters,
+    then the path patterns of limited routes. With `host_mode`, bare /{short_code} redirects
+    share the bucket of GET /links/{short_code}.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Iterable[BaseRoute],
+        limiter: Optional[RateLimiter] = None,
+        limits: Dict[str, RateLimit] = settings.RATE_LIMITS,
+        api_keys: Iterable[str] = settings.RATE_LIMIT_API_KEYS,
+        api_key_header: str = settings.RATE_LIMIT_API_KEY_HEADER,
+        host_mode: bool = settings.REDIRECT_FAST_LANE_ENABLED and settings.REDIRECT_HOST_MODE,
+    ):
+        self.app = app
+        self.limiter = limiter if limiter is not None else RateLimiter(redis_client)
+        self.limits: Dict[Tuple[str, str], RateLimit] = {}
+        for key, limit in limits.items():
+            method, path = key.split(" ", 1)
+            self.limits[method.upper(), path] = limit
+        self.methods = {method for method, _ in self.limits}
+
+        redirect_path = f"{settings.API_PREFIX}/links/{{short_code}}"
+        self.static_routes: Dict[Tuple[str, str], Tuple[BaseRoute, Optional[RateLimit]]] = {}
+        self.limited_patterns: Dict[str, List[Tuple[Pattern, BaseRoute, RateLimit]]] = {}
+        host_redirect: Optional[Tuple[Pattern, BaseRoute, RateLimit]] = None
+        for route in routes:
+            for method in getattr(route, "methods", None) or ():
+                limit = self.limits.get((method, route.path))
+                if not route.param_convertors:
+                    self.static_routes.setdefault((method, route.path), (route, limit))
+                elif limit is not None:
+                    self.limited_patterns.setdefault(method, []).append((route.path_regex, route, limit))
+                    if host_mode and method == "GET" and route.path == redirect_path:
+                        host_redirect = (re.compile(r"^/[^/]+$"), route, limit)
+        if host_redirect is not None:
+            self.limited_patterns["GET"].append(host_redirect)
+        self.api_keys = set(api_keys)
+        self.api_key_header = api_key_header.lower().encode()
+        self.blocked = LocalCache(maxsize=settings.RATE_LIMIT_LOCAL_MAXSIZE, ttl=3600.0)
+
+    def _match(self, scope: Scope) -> Tuple[Optional[BaseRoute], Optional[RateLimit]]:
+        matched = self.static_routes.get((scope["method"], scope["path"]))
+        if matched is not None:
+            return matched
+        for pattern, route, limit in self.limited_patterns.get(scope["method"], ()):
+            if pattern.match(scope["path"]):
+                return route, limit
+        return None, None
+
+    def _client(self, scope: Scope, limit: RateLimit) -> Tuple[str, str, float, int]:
+        """Bucket identity of the request: client kind, key, rate and burst"""
+        for name, value in scope["headers"]:
+            if name == self.api_key_header:
+                api_key = value.decode("latin-1")
+                if api_key in self.api_keys:
+                    digest = hashlib.blake2b(value, digest_size=8).hexdigest()
+                    rate = limit.api_key_rate if limit.api_key_rate is not None else limit.rate
+                    burst = limit.api_key_burst if limit.api_key_burst is not None else limit.burst
+                    return "api_key", f"key:{digest}", rate, burst
+                break
+        host = scope["client"][0] if scope.get("client") else "unknown"
+        return "ip", f"ip:{host}", limit.rate, limit.burst
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, client: str, retry_after: float) -> None:
+        RATE_LIMITED.labels(scope["method"], scope["route"].path, client).inc()
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests"},
+            headers={"retry-after": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        route, limit = self._match(scope)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope["route"] = route
+        client, key, rate, burst = self._client(scope, limit)
+        bucket = f"{scope['method']} {route.path}:{key}"
+
+        if not limit.statuses:
+            retry_after = await self.limiter.acquire(bucket, rate, burst)
+            if retry_after:
+                await self._reject(scope, receive, send, client, retry_after)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        blocked, until = self.blocked.get(bucket)
+        if blocked:
+            await self._reject(scope, receive, send, client, until - time.monotonic())
+            return
+
+        status = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+        if status in limit.statuses:
+            retry_after = await self.limiter.acquire(bucket, rate, burst)
+            if retry_after:
+                self.blocked.set(bucket, time.monotonic() + retry_after, retry_after)
@@ -0,0 +1,66 @@
+import hashlib
+import time
+from email.utils import formatdate
+from typing import Any, Dict, Optional
+
+import pydantic_core
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+
+from service.core.config import settings
+from service.models.domain.link import Link
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by pydantic-core's serializer.
+
+    Routes return it directly instead of a model, which skips FastAPI's response_model
+    round trip (dump, revalidate, serialize) for models the service built from trusted rows.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+def redirect_cache_headers(link: Link, now: Optional[float] = None) -> Dict[str, str]:
+    """Cache-Control and Expires headers of a redirect.
+
+    Permanent links cannot be edited, so they are cacheable for REDIRECT_PERMANENT_MAX_AGE;
+    temporary ones for REDIRECT_TEMPORARY_MAX_AGE. Neither is cached past the link's expiry.
+    """
+    now = time.time() if now is None else now
+    if link.permanent:
+        max_age = settings.REDIRECT_PERMANENT_MAX_AGE
+    else:
+        max_age = settings.REDIRECT_TEMPORARY_MAX_AGE
+    if link.expires_at is not None:
+        max_age = min(max_age, int(link.expires_at.timestamp() - now))
+
+    if max_age <= 0:
+        return {"cache-control": "no-cache", "expires": formatdate(now, usegmt=True)}
+    return {"cache-control": f"public, max-age={max_age}", "expires": formatdate(now + max_age, usegmt=True)}
+
+
+def redirect_response(link: Link) -> RedirectResponse:
+    """Redirect with the link's status code and caching policy"""
+    return RedirectResponse(url=link.original_url, status_code=link.redirect_type, headers=redirect_cache_headers(link))
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, content: Any) -> Response:
+    """JSON response with a strong ETag of its body, or 304 Not Modified if the client already has that body"""
+    response = FastJSONResponse(content, headers={"cache-control": "no-cache"})
+    etag = f'"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"etag": etag, "cache-control": "no-cache"})
+    response.headers["etag"] = etag
+    return response
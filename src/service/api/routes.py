@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, Query, Response
-from fastapi.responses import RedirectResponse
+import json
+from datetime import datetime
+from typing import Any, AsyncContextManager, Callable, List, Literal, Optional
 
-from service.api.dependencies import get_link_service
-from service.models.schemas.link import LinkCreate, LinkResponse, LinkSearchResponse, LinkStats, LinkUpdate
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import HttpUrl
+
+from service.api.dependencies import get_link_service, get_streaming_link_service
+from service.api.responses import FastJSONResponse, conditional_response, redirect_response
+from service.core.config import settings
+from service.core.exceptions import InvalidRequestException
+from service.models.schemas.link import (
+    ExpiredLinksResponse,
+    LinkCreate,
+    LinkResponse,
+    LinkSearchResponse,
+    LinkStats,
+    LinkTimeseries,
+    LinkUpdate,
+)
 from service.services.link_service import LinkService
 
 
@@ -12,16 +28,79 @@ router = APIRouter(prefix="/links", tags=["Links"])
 @router.post("/shorten", response_model=LinkResponse, status_code=201)
 async def create_short_link(link_data: LinkCreate, link_service: LinkService = Depends(get_link_service)):
     """Create a new shortened link"""
-    return await link_service.create_link(link_data)
+    return FastJSONResponse(await link_service.create_link(link_data), status_code=201)
+
+
+async def read_batch_items(request: Request) -> List[Any]:
+    """Read batch items from a JSON array body or, for application/x-ndjson, one document per line"""
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items: List[Any] = []
+        buffer = b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            items.extend(line for line in lines if line.strip())
+            if len(items) > settings.BATCH_MAX_ITEMS:
+                break
+        if buffer.strip():
+            items.append(buffer)
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise InvalidRequestException("Request body must be a JSON array or NDJSON") from e
+        if not isinstance(items, list):
+            raise InvalidRequestException("Request body must be a JSON array or NDJSON")
+
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise InvalidRequestException(f"Batch must not contain more than {settings.BATCH_MAX_ITEMS} items")
+    return items
+
+
+@router.post("/shorten/batch", response_class=StreamingResponse)
+async def create_short_links_batch(
+    request: Request,
+    open_link_service: Callable[[], AsyncContextManager[LinkService]] = Depends(get_streaming_link_service),
+):
+    """Create shortened links in bulk, streaming one NDJSON result line per item as chunks are committed"""
+    items = await read_batch_items(request)
+
+    async def results():
+        async with open_link_service() as link_service:
+            async for result in link_service.create_links_batch(items):
+                yield result.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/search", response_model=LinkSearchResponse)
+async def search_links(
+    original_url: Optional[HttpUrl] = Query(None, description="Original URL to search for"),
+    domain: Optional[str] = Query(None, description="Host of the original URLs"),
+    prefix: Optional[str] = Query(None, description="Prefix of the original URLs, starting with the scheme"),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    link_service: LinkService = Depends(get_link_service),
+):
+    """Search for shortened links by original URL, domain or URL prefix, newest first"""
+    return FastJSONResponse(await link_service.search_links(original_url, domain, prefix, limit, cursor))
+
+
+@router.get("/expired", response_model=ExpiredLinksResponse)
+async def list_expired_links(
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    link_service: LinkService = Depends(get_link_service),
+):
+    """List links removed after expiring, most recently expired first"""
+    return FastJSONResponse(await link_service.list_expired_links(limit, cursor))
 
 
 @router.get("/{short_code}")
 async def redirect_to_original(
-    short_code: str, response: Response, link_service: LinkService = Depends(get_link_service)
+    short_code: str, request: Request, link_service: LinkService = Depends(get_link_service)
 ):
     """Redirect to the original URL"""
-    original_url = await link_service.get_original_url(short_code)
-    return RedirectResponse(url=original_url)
+    return redirect_response(await link_service.get_redirect_link(short_code, request))
 
 
 @router.delete("/{short_code}", status_code=204)
@@ -34,19 +113,22 @@ async def delete_link(short_code: str, link_service: LinkService = Depends(get_l
 @router.put("/{short_code}", response_model=LinkResponse)
 async def update_link(short_code: str, link_data: LinkUpdate, link_service: LinkService = Depends(get_link_service)):
     """Update a shortened link"""
-    return await link_service.update_link(short_code, link_data)
+    return FastJSONResponse(await link_service.update_link(short_code, link_data))
 
 
 @router.get("/{short_code}/stats", response_model=LinkStats)
-async def get_link_stats(short_code: str, link_service: LinkService = Depends(get_link_service)):
-    """Get statistics for a shortened link"""
-    return await link_service.get_link_stats(short_code)
+async def get_link_stats(short_code: str, request: Request, link_service: LinkService = Depends(get_link_service)):
+    """Get statistics for a shortened link; supports If-None-Match with the returned ETag"""
+    return conditional_response(request, await link_service.get_link_stats(short_code))
 
 
-@router.get("/search", response_model=LinkSearchResponse)
-async def search_by_original_url(
-    original_url: str = Query(..., description="Original URL to search for"),
+@router.get("/{short_code}/stats/timeseries", response_model=LinkTimeseries)
+async def get_link_timeseries(
+    short_code: str,
+    start: Optional[datetime] = Query(None, description="Start of the range, inclusive"),
+    end: Optional[datetime] = Query(None, description="End of the range, exclusive"),
+    granularity: Literal["hour", "day"] = Query("hour", description="Bucket size"),
     link_service: LinkService = Depends(get_link_service),
 ):
-    """Search for a shortened link by original URL"""
-    return await link_service.search_by_original_url(original_url)
+    """Get visit counts of a shortened link per hour or day"""
+    return FastJSONResponse(await link_service.get_link_timeseries(short_code, start, end, granularity))
@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import math
+import secrets
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from service.core.config import settings
+from service.core.exceptions import ShortCodeFilterUnavailableException
+from service.core.metrics import SHORT_CODE_FILTER_LOOKUPS
+from service.db.redis import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+FILTER_ABSENT = SHORT_CODE_FILTER_LOOKUPS.labels("absent")
+FILTER_PRESENT = SHORT_CODE_FILTER_LOOKUPS.labels("present")
+FILTER_ERRORS = SHORT_CODE_FILTER_LOOKUPS.labels("error")
+
+# KEYS - bits, meta, stale flag; ARGV - h1, h2 of the short code.
+# Returns 0 if the code is certainly absent, 1 if it may be present, there is no filter yet
+# or the filter is stale.
+CONTAINS_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return 1
+end
+local params = redis.call('HMGET', KEYS[2], 'bits', 'hashes')
+if not params[1] then
+    return 1
+end
+local bits = tonumber(params[1])
+local h1 = tonumber(ARGV[1])
+local h2 = tonumber(ARGV[2])
+for i = 0, tonumber(params[2]) - 1 do
+    if redis.call('GETBIT', KEYS[1], (h1 + i * h2) % bits) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+# KEYS - bits, meta of every filter to add to; ARGV - h1, h2 of each short code.
+# Filters without meta do not exist (yet) and are skipped.
+ADD_SCRIPT = """
+for f = 1, #KEYS, 2 do
+    local params = redis.call('HMGET', KEYS[f + 1], 'bits', 'hashes')
+    if params[1] then
+        local bits = tonumber(params[1])
+        local hashes = tonumber(params[2])
+        for j = 1, #ARGV, 2 do
+            local h1 = tonumber(ARGV[j])
+            local h2 = tonumber(ARGV[j + 1])
+            for i = 0, hashes - 1 do
+                redis.call('SETBIT', KEYS[f], (h1 + i * h2) % bits, 1)
+            end
+        end
+        redis.call('HINCRBY', KEYS[f + 1], 'items', #ARGV / 2)
+    end
+end
+return 1
+"""
+
+# KEYS - lock, next bits, next meta; ARGV - rebuild token, bits, hashes, TTL.
+# Starts an empty next filter, unless the rebuild lock is no longer held with the token.
+PREPARE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2], KEYS[3])
+redis.call('SETRANGE', KEYS[2], math.floor((tonumber(ARGV[2]) - 1) / 8), '\\0')
+redis.call('HSET', KEYS[3], 'bits', ARGV[2], 'hashes', ARGV[3], 'items', 0)
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+return 1
+"""
+
+# KEYS - stale flag. Marks the filter as missing codes, with the server time.
+MARK_STALE_SCRIPT = """
+redis.call('SET', KEYS[1], redis.call('TIME')[1])
+return 1
+"""
+
+# KEYS - next bits, next meta, bits, meta, stale flag, lock; ARGV - server time the build started,
+# rebuild token. Swaps the new filter in, unless the rebuild lock is no longer held with the token;
+# the new filter holds every code created before the build started, so a stale flag raised before
+# then is cleared.
+SWAP_SCRIPT = """
+if redis.call('GET', KEYS[6]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HSET', KEYS[2], 'built_at', ARGV[1])
+redis.call('PERSIST', KEYS[1])
+redis.call('PERSIST', KEYS[2])
+redis.call('RENAME', KEYS[1], KEYS[3])
+redis.call('RENAME', KEYS[2], KEYS[4])
+local stale = redis.call('GET', KEYS[5])
+if stale and tonumber(stale) < tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[5])
+end
+redis.call('DEL', KEYS[6])
+return 1
+"""
+
+
+def bloom_parameters(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """Get the number of bits and hash functions for `capacity` items at the given false positive rate"""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def _code_hashes(short_code: str) -> Tuple[int, int]:
+    """Two 32-bit hashes of a short code; bit positions are h1 + i * h2 (double hashing)"""
+    digest = hashlib.blake2b(short_code.encode(), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "big"), int.from_bytes(digest[4:], "big") | 1
+
+
+class ShortCodeFilter:
+    """Bloom filter of existing short codes kept in Redis and shared by all workers.
+
+    A lookup that the filter rejects cannot exist, so it is answered without touching the
+    database or writing a negative cache entry. Codes are added right after they are created,
+    before the client learns them. A Bloom filter cannot forget, so deleted and expired codes
+    stay in it until the next rebuild, which replaces the filter with one built from the links
+    table and sized for twice the current number of codes. Until the first build, and whenever
+    Redis fails, every code counts as possibly present.
+
+    If a created code cannot be added, the filter is flagged stale in Redis, which turns
+    rejection off for every worker until a rebuild started after that has been swapped in; if
+    even the flag cannot be set, the create fails, since other workers would reject the code.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str = settings.SHORT_CODE_FILTER_PREFIX,
+        capacity: int = settings.SHORT_CODE_FILTER_CAPACITY,
+        error_rate: float = settings.SHORT_CODE_FILTER_ERROR_RATE,
+        build_timeout: int = settings.SHORT_CODE_FILTER_BUILD_TIMEOUT,
+    ):
+        self.redis = redis
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.build_timeout = build_timeout
+        self.bits_key = f"{prefix}bits"
+        self.meta_key = f"{prefix}meta"
+        self.next_bits_key = f"{prefix}next:bits"
+        self.next_meta_key = f"{prefix}next:meta"
+        self.stale_key = f"{prefix}stale"
+        self.lock_key = f"{prefix}lock"
+        self.contains_script = redis.register_script(CONTAINS_SCRIPT)
+        self.add_script = redis.register_script(ADD_SCRIPT)
+        self.prepare_script = redis.register_script(PREPARE_SCRIPT)
+        self.mark_stale_script = redis.register_script(MARK_STALE_SCRIPT)
+        self.swap_script = redis.register_script(SWAP_SCRIPT)
+        self.meta: Dict[str, float] = {}
+        self.stale = False
+
+    async def might_contain(self, short_code: str) -> bool:
+        """Check whether a short code may exist; False means it certainly does not"""
+        try:
+            present = await self.contains_script(
+                keys=[self.bits_key, self.meta_key, self.stale_key], args=_code_hashes(short_code)
+            )
+        except RedisError as e:
+            logger.warning("Short code filter lookup failed: %s", e)
+            FILTER_ERRORS.inc()
+            return True
+
+        if present:
+            FILTER_PRESENT.inc()
+            return True
+        FILTER_ABSENT.inc()
+        return False
+
+    async def add(self, short_codes: Iterable[str]) -> None:
+        """Add created short codes to the filter and to the one being rebuilt, if any.
+
+        Raises ShortCodeFilterUnavailableException if the codes could not be added and the
+        filter could not be flagged stale either.
+        """
+        codes = set(short_codes)
+        if not codes:
+            return
+        args = [value for short_code in codes for value in _code_hashes(short_code)]
+        try:
+            await self.add_script(
+                keys=[self.bits_key, self.meta_key, self.next_bits_key, self.next_meta_key], args=args
+            )
+            return
+        except RedisError as e:
+            logger.warning("Adding %d short codes to the filter failed, flagging it stale: %s", len(codes), e)
+
+        try:
+            await self.mark_stale_script(keys=[self.stale_key])
+        except RedisError as e:
+            raise ShortCodeFilterUnavailableException("Short code filter is unavailable, try again later") from e
+
+    async def refresh_meta(self) -> Dict[str, float]:
+        """Read the size and fill of the current filter and whether it is stale"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.meta_key)
+            pipe.exists(self.stale_key)
+            meta, stale = await pipe.execute()
+        self.meta = {name: float(value) for name, value in meta.items()}
+        self.stale = bool(stale)
+        return self.meta
+
+    def stats(self) -> List[Tuple[str, float]]:
+        """Size and estimated false positive rate of the filter as of the last `refresh_meta`"""
+        if not self.meta:
+            return []
+        bits, hashes, items = self.meta["bits"], self.meta["hashes"], self.meta.get("items", 0.0)
+        return [
+            ("bytes", math.ceil(bits / 8)),
+            ("hashes", hashes),
+            ("items", items),
+            ("false_positive_rate", (1 - math.exp(-hashes * items / bits)) ** hashes),
+        ]
+
+    def rebuild_due(self, interval: float) -> bool:
+        return not self.meta or self.stale or time.time() - self.meta.get("built_at", 0.0) >= interval
+
+    async def acquire_rebuild(self) -> Optional[str]:
+        """Claim the next rebuild, so that only one worker of the deployment runs it.
+
+        Returns the token to pass to `rebuild`, or None if another worker holds the claim.
+        """
+        token = secrets.token_hex(16)
+        if not await self.redis.set(self.lock_key, token, nx=True, ex=self.build_timeout):
+            return None
+        return token
+
+    async def rebuild(self, batches: AsyncIterator[List[str]], token: str) -> Optional[int]:
+        """Build a new filter from batches of all existing short codes and swap it in, returning their number.
+
+        Codes created meanwhile are added to both filters, so the new one misses none of them.
+        If the claim expired and another rebuild took over, the filter is left to that one and
+        None is returned.
+        """
+        started, _ = await self.redis.time()
+        capacity = max(self.capacity, 2 * int(self.meta.get("items", 0)))
+        bits, hashes = bloom_parameters(capacity, self.error_rate)
+        next_keys = [self.next_bits_key, self.next_meta_key]
+        if not await self.prepare_script(
+            keys=[self.lock_key, *next_keys], args=[token, bits, hashes, self.build_timeout]
+        ):
+            return None
+
+        count = 0
+        async for short_codes in batches:
+            args = [value for short_code in short_codes for value in _code_hashes(short_code)]
+            if args:
+                await self.add_script(keys=next_keys, args=args)
+            count += len(short_codes)
+
+        if not await self.swap_script(
+            keys=[*next_keys, self.bits_key, self.meta_key, self.stale_key, self.lock_key], args=[started, token]
+        ):
+            return None
+        await self.refresh_meta()
+        return count
+
+
+short_code_filter = ShortCodeFilter(redis_client) if settings.SHORT_CODE_FILTER_ENABLED else None
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from service.cache.local_cache import LocalCache
+from service.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheInvalidationListener:
+    """Evicts entries from a worker's local cache when any worker publishes an invalidation.
+
+    Messages published while the subscription is down are lost, so the local cache is
+    cleared every time the listener (re)subscribes. Invalidated codes are also recorded in
+    `recent_writes`, if given, to keep reads of them on the primary for a while.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[LocalCache],
+        redis_url: str = settings.REDIS_URL,
+        channel: str = settings.LINK_CACHE_INVALIDATION_CHANNEL,
+        retry_delay: float = 1.0,
+        recent_writes: Optional[LocalCache] = None,
+    ):
+        self.cache = cache
+        self.recent_writes = recent_writes
+        self.redis_url = redis_url
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            redis = Redis.from_url(self.redis_url, decode_responses=True)
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self._clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._evict(message["data"])
+            except (RedisError, OSError) as e:
+                logger.warning("Cache invalidation subscription lost: %s", e)
+            finally:
+                await redis.aclose()
+            self._clear()
+            await asyncio.sleep(self.retry_delay)
+
+    def _clear(self) -> None:
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _evict(self, short_code: str) -> None:
+        if self.cache is not None:
+            self.cache.delete(short_code)
+        if self.recent_writes is not None:
+            self.recent_writes.set(short_code, True)
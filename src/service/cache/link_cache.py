@@ -0,0 +1,209 @@
+import json
+import logging
+import math
+import random
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from service.cache.local_cache import LocalCache
+from service.core.config import settings
+from service.core.metrics import CACHE_LOOKUPS
+from service.models.domain.link import Link
+
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HITS = CACHE_LOOKUPS.labels("local", "hit")
+LOCAL_MISSES = CACHE_LOOKUPS.labels("local", "miss")
+REDIS_HITS = CACHE_LOOKUPS.labels("redis", "hit")
+REDIS_MISSES = CACHE_LOOKUPS.labels("redis", "miss")
+REDIS_ERRORS = CACHE_LOOKUPS.labels("redis", "error")
+REDIS_EARLY_REFRESHES = CACHE_LOOKUPS.labels("redis", "early_refresh")
+
+NEGATIVE_ENTRY = ""
+
+local_link_cache = (
+    LocalCache(maxsize=settings.LOCAL_LINK_CACHE_MAXSIZE, ttl=settings.LOCAL_LINK_CACHE_TTL)
+    if settings.LOCAL_LINK_CACHE_ENABLED
+    else None
+)
+
+recent_link_writes = (
+    LocalCache(maxsize=settings.LOCAL_LINK_CACHE_MAXSIZE, ttl=settings.READ_YOUR_WRITES_WINDOW)
+    if settings.DATABASE_REPLICA_URLS
+    else None
+)
+
+
+def serialize_link(link: Link, delta: float = 0.0, expiry: float = 0.0) -> str:
+    """Serialize a link into a cache entry, along with the time it took to load and when the entry expires"""
+    data = asdict(link)
+    for key in ("created_at", "expires_at"):
+        if data[key] is not None:
+            data[key] = data[key].isoformat()
+    return json.dumps({"link": data, "delta": delta, "expiry": expiry}, separators=(",", ":"))
+
+
+def deserialize_link(payload: str) -> Tuple[Link, float, float]:
+    """Restore a link from a cache entry, along with its load time and expiry"""
+    entry = json.loads(payload)
+    data = entry["link"]
+    for key in ("created_at", "expires_at"):
+        if data[key] is not None:
+            data[key] = datetime.fromisoformat(data[key])
+    return Link(**data), entry["delta"], entry["expiry"]
+
+
+class LinkCache:
+    """Read-through cache of short code lookups stored in Redis.
+
+    Unknown short codes are cached as negative entries with a short TTL, and the TTL of
+    positive entries never outlives the link's own expiration date. An optional in-process
+    tier is consulted before Redis; invalidations are broadcast on a pub/sub channel so
+    that every worker evicts its local copy. Invalidated codes are also remembered in
+    `recent_writes` for a while, so that misses on them are read from the primary rather than
+    from a replica that may not have the write yet.
+
+    Entries remember how long the link took to load. Each lookup may report a miss for an entry
+    shortly before it expires, with a probability that grows as expiry approaches and with the
+    load time (XFetch), so that hot entries get refreshed by one request ahead of time instead
+    of by all of them at once when the TTL runs out.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local: Optional[LocalCache] = None,
+        ttl: int = settings.LINK_CACHE_TTL,
+        negative_ttl: int = settings.LINK_CACHE_NEGATIVE_TTL,
+        prefix: str = settings.LINK_CACHE_PREFIX,
+        channel: str = settings.LINK_CACHE_INVALIDATION_CHANNEL,
+        recent_writes: Optional[LocalCache] = None,
+        early_refresh_beta: float = settings.LINK_CACHE_EARLY_REFRESH_BETA,
+    ):
+        self.redis = redis
+        self.local = local
+        self.recent_writes = recent_writes
+        self.early_refresh_beta = early_refresh_beta
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+        self.channel = channel
+
+    def _key(self, short_code: str) -> str:
+        return f"{self.prefix}{short_code}"
+
+    def _ttl_for(self, link: Link) -> int:
+        ttl = self.ttl
+        if link.expires_at:
+            remaining = int((link.expires_at - datetime.now(timezone.utc)).total_seconds())
+            ttl = min(ttl, remaining)
+        return ttl
+
+    async def get(self, short_code: str) -> Tuple[bool, Optional[Link]]:
+        """Look up a short code, returning whether the cache had an answer and the cached link"""
+        if self.local is not None:
+            hit, link = self.local.get(short_code)
+            if hit:
+                LOCAL_HITS.inc()
+                return True, link
+            LOCAL_MISSES.inc()
+
+        try:
+            payload = await self.redis.get(self._key(short_code))
+        except RedisError as e:
+            logger.warning("Link cache lookup failed: %s", e)
+            REDIS_ERRORS.inc()
+            return False, None
+
+        if payload is None:
+            REDIS_MISSES.inc()
+            return False, None
+        REDIS_HITS.inc()
+        if payload == NEGATIVE_ENTRY:
+            self._set_local(short_code, None, self.negative_ttl)
+            return True, None
+
+        link, delta, expiry = deserialize_link(payload)
+        if self._refresh_early(delta, expiry):
+            REDIS_EARLY_REFRESHES.inc()
+            return False, None
+        self._set_local(short_code, link, self._ttl_for(link))
+        return True, link
+
+    def _refresh_early(self, delta: float, expiry: float) -> bool:
+        if not self.early_refresh_beta or not delta or not expiry:
+            return False
+        return time.time() - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= expiry
+
+    def _set_local(self, short_code: str, link: Optional[Link], ttl: float) -> None:
+        if self.local is not None:
+            self.local.set(short_code, link, ttl)
+
+    async def set(self, link: Link, delta: float = 0.0) -> None:
+        """Cache a link until the cache TTL or the link's expiration, whichever comes first.
+
+        `delta` is the time it took to load the link, used to refresh the entry early.
+        """
+        ttl = self._ttl_for(link)
+        if ttl <= 0:
+            return
+
+        self._set_local(link.short_code, link, ttl)
+        try:
+            await self.redis.set(self._key(link.short_code), serialize_link(link, delta, time.time() + ttl), ex=ttl)
+        except RedisError as e:
+            logger.warning("Link cache write failed: %s", e)
+
+    async def prime(self, links: Sequence[Link]) -> None:
+        """Cache links loaded ahead of traffic, keeping any entry Redis already has for them"""
+        expiry = time.time()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for link in links:
+                    ttl = self._ttl_for(link)
+                    if ttl <= 0:
+                        continue
+                    self._set_local(link.short_code, link, ttl)
+                    pipe.set(self._key(link.short_code), serialize_link(link, 0.0, expiry + ttl), ex=ttl, nx=True)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Link cache priming failed: %s", e)
+
+    async def set_missing(self, short_code: str) -> None:
+        """Remember that a short code does not exist"""
+        self._set_local(short_code, None, self.negative_ttl)
+        try:
+            await self.redis.set(self._key(short_code), NEGATIVE_ENTRY, ex=self.negative_ttl)
+        except RedisError as e:
+            logger.warning("Link cache write failed: %s", e)
+
+    def recently_written(self, short_code: str) -> bool:
+        """Check whether a short code was invalidated recently enough that replicas may lag behind"""
+        return self.recent_writes is not None and self.recent_writes.get(short_code)[0]
+
+    async def invalidate(self, short_code: str) -> None:
+        """Drop any cached entry for a short code in Redis and in every worker's local tier"""
+        await self.invalidate_many([short_code])
+
+    async def invalidate_many(self, short_codes: Sequence[str]) -> None:
+        """Drop cached entries for several short codes in a single round trip"""
+        for short_code in short_codes:
+            if self.local is not None:
+                self.local.delete(short_code)
+            if self.recent_writes is not None:
+                self.recent_writes.set(short_code, True)
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for short_code in short_codes:
+                    pipe.delete(self._key(short_code))
+                    pipe.publish(self.channel, short_code)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Link cache invalidation failed: %s", e)
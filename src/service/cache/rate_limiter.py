@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import List
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from service.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] - bucket; ARGV - rate (tokens per second), burst, cost.
+# Returns {1, "0"} when the tokens were taken, or {0, seconds until enough tokens are available}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class LocalTokenBuckets:
+    """Per-worker token buckets, used while Redis is unavailable.
+
+    The number of buckets is bounded; the least recently used ones are dropped first, which
+    only ever makes a client's bucket full again.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def acquire(self, key: str, rate: float, burst: int, cost: float = 1.0) -> float:
+        """Take `cost` tokens, returning 0 if they were available or the seconds to wait otherwise"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+
+
+class RateLimiter:
+    """Token buckets shared by all workers through Redis.
+
+    Each check is a single atomic script call. When Redis fails, checks fall back to
+    per-worker buckets for `retry_interval` seconds before Redis is tried again, so an outage
+    neither lets all traffic through nor adds a socket timeout to every request.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str = settings.RATE_LIMIT_PREFIX,
+        local_maxsize: int = settings.RATE_LIMIT_LOCAL_MAXSIZE,
+        retry_interval: float = settings.RATE_LIMIT_REDIS_RETRY_INTERVAL,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.local = LocalTokenBuckets(local_maxsize)
+        self.retry_interval = retry_interval
+        self._redis_retry_at = 0.0
+
+    async def acquire(self, key: str, rate: float, burst: int, cost: float = 1.0) -> float:
+        """Take `cost` tokens from a bucket, returning 0 if allowed or the seconds to wait until they are available"""
+        if time.monotonic() < self._redis_retry_at:
+            return self.local.acquire(key, rate, burst, cost)
+
+        try:
+            allowed, retry_after = await self.script(keys=[f"{self.prefix}{key}"], args=[rate, burst, cost])
+        except RedisError as e:
+            logger.warning("Rate limiter fell back to local buckets: %s", e)
+            self._redis_retry_at = time.monotonic() + self.retry_interval
+            return self.local.acquire(key, rate, burst, cost)
+
+        return 0.0 if int(allowed) else float(retry_after)
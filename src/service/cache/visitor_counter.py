@@ -0,0 +1,118 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from service.core.config import settings
+from service.db.redis import redis_client
+from service.models.domain.visit import VisitEvent
+
+
+logger = logging.getLogger(__name__)
+
+BUCKET_FORMATS = {"hour": "%Y%m%d%H", "day": "%Y%m%d"}
+
+
+def _visitor_id(visit: VisitEvent) -> Optional[bytes]:
+    """Identify a visitor by IP address and user agent; visits with neither cannot be told apart"""
+    if visit.ip_address is None and visit.user_agent is None:
+        return None
+    visitor = f"{visit.ip_address or ''}\0{visit.user_agent or ''}"
+    return hashlib.blake2b(visitor.encode(), digest_size=8).digest()
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class UniqueVisitorCounter:
+    """Estimates unique visitors per link with Redis HyperLogLogs.
+
+    Each link has one HyperLogLog over all its visits, kept until the link has gone `ttl`
+    seconds without visits or is deleted, and one per UTC hour and day, kept for
+    `retention_days` like the raw visits. An estimate has a standard error of 0.81% and a key
+    takes at most 12 KB, far less while it holds few visitors. Visitors are told apart by IP
+    address and user agent, so visitors behind one NAT with the same browser count once.
+    Counting is best effort: visits seen while Redis is unavailable are not counted.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str = settings.UNIQUE_VISITORS_PREFIX,
+        ttl: int = settings.UNIQUE_VISITORS_TTL,
+        retention_days: int = settings.VISIT_RETENTION_DAYS,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self.bucket_ttl = timedelta(days=retention_days)
+
+    def _key(self, link_id: int) -> str:
+        return f"{self.prefix}{link_id}"
+
+    def _bucket_key(self, link_id: int, bucket: datetime, granularity: str) -> str:
+        return f"{self.prefix}{link_id}:{granularity}:{_utc(bucket).strftime(BUCKET_FORMATS[granularity])}"
+
+    async def add(self, visits: Sequence[VisitEvent]) -> None:
+        """Add the visitors of a batch of visits to the per-link and per-bucket estimates"""
+        visitors: Dict[str, Set[bytes]] = {}
+        bucket_expiry: Dict[str, datetime] = {}
+        for visit in visits:
+            visitor = _visitor_id(visit)
+            if visitor is None:
+                continue
+            visited_at = _utc(visit.visited_at)
+            visitors.setdefault(self._key(visit.link_id), set()).add(visitor)
+            for granularity in BUCKET_FORMATS:
+                key = self._bucket_key(visit.link_id, visited_at, granularity)
+                visitors.setdefault(key, set()).add(visitor)
+                bucket_expiry[key] = max(bucket_expiry.get(key, visited_at), visited_at)
+        if not visitors:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, members in visitors.items():
+                    pipe.pfadd(key, *members)
+                    if key in bucket_expiry:
+                        pipe.expireat(key, bucket_expiry[key] + self.bucket_ttl)
+                    else:
+                        pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("Counting unique visitors of %d visits failed: %s", len(visits), e)
+
+    async def count(self, link_id: int) -> Optional[int]:
+        """Estimate the unique visitors of a link, or None if Redis is unavailable"""
+        try:
+            return await self.redis.pfcount(self._key(link_id))
+        except RedisError as e:
+            logger.warning("Reading unique visitors of link %d failed: %s", link_id, e)
+            return None
+
+    async def count_buckets(self, link_id: int, buckets: Sequence[datetime], granularity: str) -> Optional[List[int]]:
+        """Estimate the unique visitors of a link in each hour or day starting at `buckets`"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for bucket in buckets:
+                    pipe.pfcount(self._bucket_key(link_id, bucket, granularity))
+                return await pipe.execute()
+        except RedisError as e:
+            logger.warning("Reading unique visitors of link %d per %s failed: %s", link_id, granularity, e)
+            return None
+
+    async def forget(self, link_id: int) -> None:
+        """Drop the estimate of a deleted link; its hourly and daily ones expire on their own"""
+        try:
+            await self.redis.delete(self._key(link_id))
+        except RedisError as e:
+            logger.warning("Dropping unique visitors of link %d failed: %s", link_id, e)
+
+
+unique_visitors = UniqueVisitorCounter(redis_client) if settings.UNIQUE_VISITORS_ENABLED else None
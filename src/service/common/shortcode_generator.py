@@ -1,13 +1,143 @@
-import random
+import asyncio
+import hashlib
 import string
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List
 
 from service.core.config import settings
 
 
-def generate_short_code(length: int = None) -> str:
-    """Generate a random short code for a URL"""
-    if length is None:
-        length = settings.SHORT_CODE_LENGTH
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+ALPHABET_INDEX = {char: index for index, char in enumerate(ALPHABET)}
 
-    characters = string.ascii_letters + string.digits
-    return "".join(random.choice(characters) for _ in range(length))
+# Short codes hash into SLOTS slots, which the shard map assigns to databases
+SLOTS = BASE
+
+
+def encode_base62(value: int, length: int) -> str:
+    """Encode a non-negative integer as a zero-padded base62 string of the given length"""
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        chars.append(ALPHABET[digit])
+    if value:
+        raise ValueError(f"Value does not fit into {length} base62 digits")
+    return "".join(reversed(chars))
+
+
+def _head_hash(head: str) -> int:
+    return int.from_bytes(hashlib.blake2b(head.encode(), digest_size=8).digest(), "big")
+
+
+def code_slot(short_code: str) -> int:
+    """Get the slot of a short code: a stable hash of all but its last character, shifted by the last one"""
+    if not short_code:
+        return 0
+    last = short_code[-1]
+    return (_head_hash(short_code[:-1]) + ALPHABET_INDEX.get(last, ord(last))) % SLOTS
+
+
+def with_slot(code: str, slot: int) -> str:
+    """Append the character that puts `code` into `slot`"""
+    return code + ALPHABET[(slot - _head_hash(code)) % SLOTS]
+
+
+class FeistelPermutation:
+    """Keyed bijection of range(size) onto itself.
+
+    A balanced Feistel network permutes the smallest even-width bit space covering `size`;
+    outputs that fall outside the range are fed back in (cycle walking) until they land in it.
+    """
+
+    def __init__(self, size: int, key: bytes, rounds: int = 4):
+        bits = max(2, (size - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        self.size = size
+        self.key = key
+        self.rounds = rounds
+
+    def _round(self, round_index: int, value: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8, "big") + bytes([round_index]), key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def permute(self, value: int) -> int:
+        if not 0 <= value < self.size:
+            raise ValueError("Value is outside of the permutation domain")
+
+        while True:
+            left, right = value >> self.half_bits, value & self.mask
+            for round_index in range(self.rounds):
+                left, right = right, left ^ self._round(round_index, right)
+            value = (left << self.half_bits) | right
+            if value < self.size:
+                return value
+
+
+class ShortCodeAllocator:
+    """Maps sequential IDs reserved from the database to unique, non-sequential short codes.
+
+    IDs are reserved in blocks, so a worker only talks to the database once per `block_size`
+    codes. The first `fill` share of the length-`min_length` keyspace is used first, then the
+    allocator moves on to codes one character longer, and so on. Within one length every ID
+    goes through a keyed permutation, so two IDs never produce the same code. With `slotted`,
+    every code gets one more character that places it in slot `ID % SLOTS`, so that new links
+    are spread evenly over the shards.
+    """
+
+    def __init__(
+        self,
+        min_length: int = settings.SHORT_CODE_LENGTH,
+        block_size: int = settings.SHORT_CODE_BLOCK_SIZE,
+        fill: float = settings.SHORT_CODE_KEYSPACE_FILL,
+        secret: str = settings.SHORT_CODE_SECRET,
+        slotted: bool = bool(settings.DATABASE_SHARD_URLS),
+    ):
+        self.min_length = min_length
+        self.block_size = block_size
+        self.fill = fill
+        self.secret = hashlib.blake2b(secret.encode(), digest_size=32).digest()
+        self.slotted = slotted
+        self._ids: Deque[int] = deque()
+        self._lock = asyncio.Lock()
+        self._permutations: Dict[int, FeistelPermutation] = {}
+
+    def _permutation(self, length: int) -> FeistelPermutation:
+        permutation = self._permutations.get(length)
+        if permutation is None:
+            key = hashlib.blake2b(length.to_bytes(2, "big"), key=self.secret, digest_size=32).digest()
+            permutation = self._permutations[length] = FeistelPermutation(BASE**length, key)
+        return permutation
+
+    def _capacity(self, length: int) -> int:
+        return int(BASE**length * self.fill)
+
+    def code_for_id(self, code_id: int) -> str:
+        """Get the short code of a reserved ID"""
+        slot = code_id % SLOTS
+        length = self.min_length
+        while code_id >= self._capacity(length):
+            code_id -= self._capacity(length)
+            length += 1
+        short_code = encode_base62(self._permutation(length).permute(code_id), length)
+        return with_slot(short_code, slot) if self.slotted else short_code
+
+    async def allocate(self, reserve: Callable[[int], Awaitable[List[int]]]) -> str:
+        """Get the next short code, reserving a new block of IDs through `reserve` when needed"""
+        async with self._lock:
+            if not self._ids:
+                self._ids.extend(await reserve(self.block_size))
+            code_id = self._ids.popleft()
+        return self.code_for_id(code_id)
+
+    async def allocate_many(self, reserve: Callable[[int], Awaitable[List[int]]], count: int) -> List[str]:
+        """Get `count` short codes at once, reserving as many IDs as needed in a single call"""
+        async with self._lock:
+            if len(self._ids) < count:
+                self._ids.extend(await reserve(max(self.block_size, count - len(self._ids))))
+            code_ids = [self._ids.popleft() for _ in range(count)]
+        return [self.code_for_id(code_id) for code_id in code_ids]
+
+
+short_code_allocator = ShortCodeAllocator()
@@ -0,0 +1,59 @@
+import hashlib
+from typing import Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+DIGEST_SIZE = 16
+
+
+def normalize_url(url: str) -> str:
+    """Bring equivalent URLs to one form.
+
+    Lowercases the scheme and host, drops default ports and trailing slashes of the path, and
+    orders query parameters by name (keeping the relative order of repeated names).
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path.rstrip("/")
+    query = "&".join(sorted((param for param in parts.query.split("&") if param), key=lambda p: p.split("=", 1)[0]))
+
+    return urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+
+def url_digest(url: str) -> bytes:
+    """Get a compact digest of the normalized form of a URL, used to look up links by URL"""
+    return hashlib.sha256(normalize_url(url).encode()).digest()[:DIGEST_SIZE]
+
+
+def url_host(url: str) -> str:
+    """Get the lowercased host of a URL, without userinfo or port"""
+    return (urlsplit(url).hostname or "").lower()
+
+
+def split_url_prefix(prefix: str) -> Tuple[str, Optional[str]]:
+    """Lowercase the scheme and host of a URL prefix and get the host if the prefix contains all of it.
+
+    The host is known only when the prefix continues past it, e.g. "https://example.com/" but
+    not "https://example.co", which could be the start of "example.com" as well.
+    """
+    scheme, separator, rest = prefix.partition("://")
+    if not separator:
+        return prefix, None
+
+    end = min((index for index in (rest.find(char) for char in "/?#") if index >= 0), default=-1)
+    if end < 0:
+        return prefix.lower(), None
+
+    userinfo, at, hostport = rest[:end].rpartition("@")
+    netloc = f"{userinfo}{at}{hostport.lower()}"
+    return f"{scheme.lower()}://{netloc}{rest[end:]}", url_host(f"{scheme}://{netloc}")
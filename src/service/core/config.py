@@ -1,17 +1,132 @@
-from typing import List
+from typing import Dict, List, Literal, Optional
 
+from pydantic import BaseModel, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings
 
 
+class RateLimit(BaseModel):
+    """Token bucket refilled with `rate` tokens per second up to `burst` tokens.
+
+    Requests with a known API key get their own bucket with the `api_key_*` limits. With
+    `statuses`, only responses with one of those statuses spend a token, and the client is
+    turned away once its bucket runs dry.
+    """
+
+    rate: PositiveFloat
+    burst: PositiveInt
+    api_key_rate: Optional[PositiveFloat] = None
+    api_key_burst: Optional[PositiveInt] = None
+    statuses: List[int] = []
+
+
 class Settings(BaseSettings):
     API_PREFIX: str = "/api/v1"
 
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_GRACEFUL_SHUTDOWN_TIMEOUT: int = 20
+    SERVER_ACCESS_LOG: bool = False
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+
     DATABASE_URL: str = "postgresql+asyncpg://postgres:postgres@db:5432/postgres"
     DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    LINK_REPOSITORY: Literal["sqlalchemy", "asyncpg"] = "sqlalchemy"
+    ASYNCPG_POOL_MIN_SIZE: int = 5
+    ASYNCPG_POOL_MAX_SIZE: int = 20
+    ASYNCPG_STATEMENT_CACHE_SIZE: int = 100
+
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_MAX_LAG: float = 1.0
+    REPLICA_LAG_CHECK_INTERVAL: float = 1.0
+    READ_YOUR_WRITES_WINDOW: float = 5.0
+    READ_YOUR_WRITES_COOKIE: str = "last_write"
+
+    DATABASE_SHARD_URLS: List[str] = []
+    SHARD_MAP: Dict[int, int] = {}
+    SHARD_REBALANCING: bool = False
+
+    REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_SOCKET_TIMEOUT: float = 0.5
 
     CORS_ORIGINS: List[str] = ["*"]
 
+    REDIRECT_FAST_LANE_ENABLED: bool = True
+    REDIRECT_HOST_MODE: bool = False
+    REDIRECT_PERMANENT_MAX_AGE: int = 86400
+    REDIRECT_TEMPORARY_MAX_AGE: int = 0
+
     SHORT_CODE_LENGTH: int = 6
+    SHORT_CODE_SECRET: str = "change-me"
+    SHORT_CODE_BLOCK_SIZE: int = 100
+    SHORT_CODE_KEYSPACE_FILL: float = 0.9
+    SHORT_CODE_ALLOCATION_ATTEMPTS: int = 5
+
+    BATCH_MAX_ITEMS: int = 100000
+    BATCH_CHUNK_SIZE: int = 1000
+
+    SEARCH_PAGE_SIZE: int = 50
+    SEARCH_MAX_PAGE_SIZE: int = 500
+
+    LINK_CACHE_ENABLED: bool = True
+    LINK_CACHE_PREFIX: str = "link:v3:"
+    LINK_CACHE_TTL: int = 3600
+    LINK_CACHE_NEGATIVE_TTL: int = 30
+    LINK_CACHE_INVALIDATION_CHANNEL: str = "link-cache:invalidate"
+    LINK_CACHE_EARLY_REFRESH_BETA: float = 1.0
+
+    LOCAL_LINK_CACHE_ENABLED: bool = True
+    LOCAL_LINK_CACHE_MAXSIZE: int = 10000
+    LOCAL_LINK_CACHE_TTL: float = 30.0
+
+    SHORT_CODE_FILTER_ENABLED: bool = True
+    SHORT_CODE_FILTER_PREFIX: str = "codes:bloom:"
+    SHORT_CODE_FILTER_CAPACITY: int = 1000000
+    SHORT_CODE_FILTER_ERROR_RATE: float = 0.01
+    SHORT_CODE_FILTER_REBUILD_INTERVAL: float = 3600.0
+    SHORT_CODE_FILTER_REFRESH_INTERVAL: float = 5.0
+    SHORT_CODE_FILTER_BUILD_TIMEOUT: int = 600
+    SHORT_CODE_FILTER_BATCH_SIZE: int = 10000
+
+    VISIT_BUFFER_MAXSIZE: int = 100000
+    VISIT_BATCH_SIZE: int = 1000
+    VISIT_FLUSH_INTERVAL: float = 0.5
+    VISIT_BUFFER_OVERFLOW: Literal["drop", "block"] = "drop"
+    VISIT_FLUSH_RETRIES: int = 5
+    VISIT_FLUSH_RETRY_DELAY: float = 0.5
+
+    VISIT_RETENTION_DAYS: int = 90
+    VISIT_PARTITIONS_AHEAD_DAYS: int = 7
+    VISIT_PARTITION_MAINTENANCE_INTERVAL: float = 3600.0
+    TIMESERIES_MAX_BUCKETS: int = 2000
+
+    UNIQUE_VISITORS_ENABLED: bool = True
+    UNIQUE_VISITORS_PREFIX: str = "visitors:"
+    UNIQUE_VISITORS_TTL: int = 365 * 24 * 3600
+
+    EXPIRY_SWEEP_INTERVAL: float = 10.0
+    EXPIRY_SWEEP_BATCH_SIZE: int = 1000
+
+    WARMUP_ENABLED: bool = True
+    WARMUP_CACHE_LINKS: int = 1000
+    WARMUP_TIMEOUT: float = 30.0
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PREFIX: str = "ratelimit:"
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    RATE_LIMIT_API_KEYS: List[str] = []
+    RATE_LIMIT_LOCAL_MAXSIZE: int = 100000
+    RATE_LIMIT_REDIS_RETRY_INTERVAL: float = 5.0
+    RATE_LIMITS: Dict[str, RateLimit] = {
+        "POST /api/v1/links/shorten": RateLimit(rate=10, burst=100, api_key_rate=200, api_key_burst=2000),
+        "POST /api/v1/links/shorten/batch": RateLimit(rate=0.2, burst=10, api_key_rate=5, api_key_burst=50),
+        "GET /api/v1/links/{short_code}": RateLimit(rate=1, burst=50, statuses=[404]),
+    }
 
     class Config:
         env_file = ".env"
@@ -20,3 +20,24 @@ class DuplicateAliasException(URLShortenerException):
 
     def __init__(self, detail: str):
         super().__init__(detail=detail, status_code=status.HTTP_409_CONFLICT)
+
+
+class InvalidRequestException(URLShortenerException):
+    """Exception raised when request parameters are valid on their own but not together"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail=detail, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class LinkNotEditableException(URLShortenerException):
+    """Exception raised when changing a link that clients may have cached permanently"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail=detail, status_code=status.HTTP_409_CONFLICT)
+
+
+class ShortCodeFilterUnavailableException(URLShortenerException):
+    """Exception raised when a created short code cannot be made known to every worker"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail=detail, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,75 @@
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+from service.core.config import settings
+from service.db.postgres import ReplicaSet, replicas
+
+
+def asyncpg_dsn(url: str) -> str:
+    """Turn an SQLAlchemy asyncpg URL into a DSN asyncpg understands"""
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class AsyncpgPools:
+    """Plain asyncpg pools of the primary and the replicas, for the queries that bypass SQLAlchemy.
+
+    Pools are opened in the application lifespan, since they are bound to the running event
+    loop. Connections keep their own cache of prepared statements, so every hot query is
+    parsed and planned once per connection. Replicas are chosen the same way as for
+    SQLAlchemy sessions, from the lag measured for `replica_set`.
+    """
+
+    def __init__(
+        self,
+        url: str = settings.DATABASE_URL,
+        replica_set: ReplicaSet = replicas,
+        min_size: int = settings.ASYNCPG_POOL_MIN_SIZE,
+        max_size: int = settings.ASYNCPG_POOL_MAX_SIZE,
+    ):
+        self.url = url
+        self.replica_set = replica_set
+        self.min_size = min_size
+        self.max_size = max_size
+        self._primary: Optional[asyncpg.Pool] = None
+        self._replicas: List[asyncpg.Pool] = []
+
+    async def open(self) -> None:
+        self._primary = await self._create_pool(self.url)
+        self._replicas = [await self._create_pool(url) for url in self.replica_set.urls]
+
+    async def close(self) -> None:
+        for pool in [self._primary, *self._replicas]:
+            if pool is not None:
+                await pool.close()
+        self._primary = None
+        self._replicas = []
+
+    async def _create_pool(self, url: str) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            asyncpg_dsn(url),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=settings.ASYNCPG_STATEMENT_CACHE_SIZE,
+        )
+
+    @property
+    def primary(self) -> asyncpg.Pool:
+        if self._primary is None:
+            raise RuntimeError("asyncpg pools are not open")
+        return self._primary
+
+    def named_pools(self) -> List[Tuple[str, asyncpg.Pool]]:
+        """Get the open pools labelled "primary", "replica0", "replica1" and so on"""
+        pools = [("primary", self._primary)] if self._primary is not None else []
+        return pools + [(f"replica{index}", pool) for index, pool in enumerate(self._replicas)]
+
+    def for_read(self) -> asyncpg.Pool:
+        """Get the pool of a replica fresh enough to read from, or the primary pool"""
+        index = self.replica_set.pick()
+        if index is None or index >= len(self._replicas):
+            return self.primary
+        return self._replicas[index]
+
+
+asyncpg_pools = AsyncpgPools()
@@ -1,18 +1,208 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import itertools
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from service.common.shortcode_generator import SLOTS, code_slot
 from service.core.config import settings
+from service.core.metrics import observe_query
+
+
+logger = logging.getLogger(__name__)
+
+
+def instrument_engine(async_engine: AsyncEngine) -> AsyncEngine:
+    """Report the duration of every statement run through an engine to the query metrics.
+
+    The start time is kept on the statement's execution context, which is discarded with it,
+    so statements that fail and never reach `after_cursor_execute` leave nothing behind.
+    """
 
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DB_ECHO,
-    future=True,
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is not None:
+            observe_query(time.perf_counter() - started)
+
+    return async_engine
+
+
+engine = instrument_engine(
+    create_async_engine(
+        settings.DATABASE_URL,
+        echo=settings.DB_ECHO,
+        future=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
 )
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaSet:
+    """Read replicas and their last measured replication lag.
+
+    Reads are spread round-robin over the replicas lagging at most `max_lag` seconds behind the
+    primary. A replica whose lag has not been measured yet, or could not be measured, is not
+    used, so reads go to the primary until the first successful check.
+    """
+
+    def __init__(self, urls: List[str], max_lag: float = settings.REPLICA_MAX_LAG):
+        self.urls = urls
+        self.max_lag = max_lag
+        self.engines = [
+            instrument_engine(
+                create_async_engine(
+                    url,
+                    echo=settings.DB_ECHO,
+                    future=True,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                )
+            )
+            for url in urls
+        ]
+        self.sessions = [
+            sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False) for replica_engine in self.engines
+        ]
+        self.lag: List[Optional[float]] = [None] * len(self.engines)
+        self._next = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def pick(self) -> Optional[int]:
+        """Get the index of the next replica fresh enough to read from, or None to read from the primary"""
+        fresh = [index for index, lag in enumerate(self.lag) if lag is not None and lag <= self.max_lag]
+        if not fresh:
+            return None
+        return fresh[next(self._next) % len(fresh)]
+
+    def session_factory(self) -> Optional[Callable[[], AsyncSession]]:
+        """Get the session factory of a replica fresh enough to read from, or None to read from the primary"""
+        index = self.pick()
+        return self.sessions[index] if index is not None else None
+
+    async def check_lag(self) -> None:
+        """Measure the replication lag of every replica"""
+        for index, replica_engine in enumerate(self.engines):
+            try:
+                async with replica_engine.connect() as conn:
+                    self.lag[index] = float((await conn.execute(REPLICA_LAG_QUERY)).scalar())
+            except Exception as e:
+                logger.warning("Could not measure the lag of replica %d: %s", index, e)
+                self.lag[index] = None
+
+
+replicas = ReplicaSet(settings.DATABASE_REPLICA_URLS)
+
+
+class ShardSet:
+    """Databases the links are spread over, by the slot their short code hashes into.
+
+    Shard 0 is the primary database with its replicas; `urls` are the databases of the other
+    shards. A slot belongs to the shard `shard_map` assigns it to, or to shard `slot % N` when
+    the map does not mention it.
+    """
+
+    def __init__(self, urls: List[str], shard_map: Dict[int, int]):
+        self.urls = [settings.DATABASE_URL, *urls]
+        self.engines = [engine] + [
+            instrument_engine(
+                create_async_engine(
+                    url,
+                    echo=settings.DB_ECHO,
+                    future=True,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                )
+            )
+            for url in urls
+        ]
+        self.sessions = [async_session] + [
+            sessionmaker(shard_engine, class_=AsyncSession, expire_on_commit=False) for shard_engine in self.engines[1:]
+        ]
+        for slot, shard in shard_map.items():
+            if not 0 <= slot < SLOTS or not 0 <= shard < len(self.engines):
+                raise ValueError(f"Shard map entry {slot}: {shard} is out of range")
+        self.slots = [shard_map.get(slot, slot % len(self.engines)) for slot in range(SLOTS)]
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def shard_of(self, short_code: str) -> int:
+        """Get the index of the shard a short code belongs to"""
+        return self.slots[code_slot(short_code)]
+
+
+shards = ShardSet(settings.DATABASE_SHARD_URLS, settings.SHARD_MAP)
+
+
+async def dispose_engines() -> None:
+    """Close the pooled connections of the primary, replica and shard engines"""
+    await engine.dispose()
+    for other_engine in [*replicas.engines, *shards.engines[1:]]:
+        await other_engine.dispose()
+
+
+def wrote_recently(request: Request) -> bool:
+    """Check whether the client made a write recent enough that replicas may not have it yet"""
+    try:
+        return float(request.cookies.get(settings.READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
 
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+@asynccontextmanager
+async def open_read_session(request: Request, db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """Open a session for reads: a replica, or `db` right after the client's own writes"""
+    replica_session = replicas.session_factory()
+    if replica_session is None or wrote_recently(request):
+        yield db
+        return
+
+    async with replica_session() as session:
+        yield session
+
+
+@asynccontextmanager
+async def open_shard_sessions() -> AsyncIterator[List[AsyncSession]]:
+    """Open a session on every shard after the first one, which is the primary"""
+    async with AsyncExitStack() as stack:
+        yield [await stack.enter_async_context(session_factory()) for session_factory in shards.sessions[1:]]
+
+
+async def get_shard_dbs() -> List[AsyncSession]:
+    async with open_shard_sessions() as sessions:
+        yield sessions
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)) -> AsyncSession:
+    """Get a session for reads: a replica, or the primary right after the client's own writes"""
+    async with open_read_session(request, db) as session:
+        yield session
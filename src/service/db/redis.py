@@ -0,0 +1,15 @@
+from redis.asyncio import Redis
+
+from service.core.config import settings
+
+
+redis_client = Redis.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+)
+
+
+async def get_redis() -> Redis:
+    return redis_client
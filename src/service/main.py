@@ -1,19 +1,83 @@
 import time
+from contextlib import AsyncExitStack, asynccontextmanager
 
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from sqlalchemy import text
 
+from service.api.fast_lane import RedirectFastLane
+from service.api.metrics import router as metrics_router
+from service.api.middleware import MetricsMiddleware
+from service.api.rate_limit import RateLimitMiddleware
+from service.api.responses import FastJSONResponse
 from service.api.router import router
+from service.cache.code_filter import short_code_filter
+from service.cache.invalidation import CacheInvalidationListener
+from service.cache.link_cache import LinkCache, local_link_cache, recent_link_writes
 from service.core.config import settings
 from service.core.exceptions import URLShortenerException
-from service.db.postgres import get_db
+from service.db.asyncpg_pool import asyncpg_pools
+from service.db.postgres import dispose_engines, get_db, replicas
+from service.db.redis import redis_client
+from service.workers.code_filter_maintenance import ShortCodeFilterMaintenance
+from service.workers.expiry_sweeper import ExpirySweeper
+from service.workers.partition_maintenance import PartitionMaintenance
+from service.workers.replica_monitor import ReplicaLagMonitor
+from service.workers.visit_buffer import visit_buffer
+from service.workers.warmup import startup_warmup
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Start the pools and background workers, and stop them in reverse order on shutdown.
+
+    Shutdown runs after the server has stopped accepting connections and drained in-flight
+    requests, so the visit buffer's final flush sees every recorded visit. Whatever started
+    is stopped even if a later startup step fails.
+    """
+    async with AsyncExitStack() as stack:
+        stack.push_async_callback(redis_client.aclose)
+        stack.push_async_callback(dispose_engines)
+        if settings.LINK_REPOSITORY == "asyncpg":
+            await asyncpg_pools.open()
+            stack.push_async_callback(asyncpg_pools.close)
+        if settings.LINK_CACHE_ENABLED and (local_link_cache is not None or recent_link_writes is not None):
+            invalidation_listener = CacheInvalidationListener(local_link_cache, recent_writes=recent_link_writes)
+            await invalidation_listener.start()
+            stack.push_async_callback(invalidation_listener.stop)
+        if len(replicas):
+            replica_monitor = ReplicaLagMonitor()
+            await replica_monitor.start()
+            stack.push_async_callback(replica_monitor.stop)
+        await visit_buffer.start()
+        stack.push_async_callback(visit_buffer.stop)
+        partition_maintenance = PartitionMaintenance()
+        await partition_maintenance.start()
+        stack.push_async_callback(partition_maintenance.stop)
+        expiry_sweeper = ExpirySweeper(
+            cache=LinkCache(redis_client, local_link_cache, recent_writes=recent_link_writes)
+            if settings.LINK_CACHE_ENABLED
+            else None
+        )
+        await expiry_sweeper.start()
+        stack.push_async_callback(expiry_sweeper.stop)
+        if short_code_filter is not None:
+            code_filter_maintenance = ShortCodeFilterMaintenance(short_code_filter)
+            await code_filter_maintenance.start()
+            stack.push_async_callback(code_filter_maintenance.stop)
+        await startup_warmup.start()
+        stack.push_async_callback(startup_warmup.stop)
+
+        yield
 
 
 app = FastAPI(
     title="URL Shortener API",
     description="A service for shortening URLs with statistics",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 app.add_middleware(
@@ -25,15 +89,24 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
+async def mark_recent_write(request: Request, call_next):
+    """Keep the client's reads on the primary for a while after it changed something"""
     response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            settings.READ_YOUR_WRITES_COOKIE,
+            str(time.time() + settings.READ_YOUR_WRITES_WINDOW),
+            max_age=int(settings.READ_YOUR_WRITES_WINDOW) + 1,
+            httponly=True,
+            samesite="lax",
+        )
     return response
 
 
+if len(replicas):
+    app.middleware("http")(mark_recent_write)
+
+
 @app.exception_handler(URLShortenerException)
 async def url_shortener_exception_handler(_: Request, exc: URLShortenerException):
     return JSONResponse(
@@ -43,12 +116,28 @@ async def url_shortener_exception_handler(_: Request, exc: URLShortenerException
 
 
 app.include_router(router)
+app.include_router(metrics_router)
 
 
 @app.get("/health", tags=["Health"])
 async def health_check(db=Depends(get_db)):
     try:
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
-        return {"status": "unhealthy", "database": str(e)}
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "database": str(e)})
+
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check(db=Depends(get_db)):
+    """Report whether this worker has finished its startup warm-up and can reach the database"""
+    if not startup_warmup.ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return await health_check(db)
+
+
+if settings.REDIRECT_FAST_LANE_ENABLED:
+    app.add_middleware(RedirectFastLane, routes=app.routes)
+if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMITS:
+    app.add_middleware(RateLimitMiddleware, routes=app.routes)
+app.add_middleware(MetricsMiddleware)
@@ -3,7 +3,11 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+DEFAULT_REDIRECT_TYPE = 307
+PERMANENT_REDIRECT_TYPES = (301, 308)
+
+
+@dataclass(slots=True)
 class Link:
     id: int
     short_code: str
@@ -11,3 +15,22 @@ class Link:
     custom_alias: bool
     created_at: datetime
     expires_at: Optional[datetime] = None
+    redirect_type: int = DEFAULT_REDIRECT_TYPE
+
+    @property
+    def permanent(self) -> bool:
+        """Permanent redirects may be cached by clients indefinitely, so such links cannot be edited"""
+        return self.redirect_type in PERMANENT_REDIRECT_TYPES
+
+
+@dataclass(slots=True)
+class ExpiredLink:
+    id: int
+    short_code: str
+    original_url: str
+    custom_alias: bool
+    created_at: datetime
+    expires_at: datetime
+    expired_at: datetime
+    visit_count: int = 0
+    last_visited_at: Optional[datetime] = None
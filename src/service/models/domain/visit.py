@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass(slots=True)
+class VisitEvent:
+    link_id: int
+    visited_at: datetime
+    user_agent: Optional[str] = None
+    ip_address: Optional[str] = None
+    referrer: Optional[str] = None
+    short_code: Optional[str] = None
+
+
+@dataclass(slots=True)
+class LinkCounters:
+    visit_count: int = 0
+    first_visited_at: Optional[datetime] = None
+    last_visited_at: Optional[datetime] = None
@@ -1,7 +1,16 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, Any, List, Literal, Optional
 
-from pydantic import BaseModel, HttpUrl, field_validator
+from pydantic import BaseModel, HttpUrl, WithJsonSchema, field_validator
+
+from service.models.domain.link import DEFAULT_REDIRECT_TYPE
+
+
+# URLs read back from the database were validated as HttpUrl on write and are returned as stored
+StoredUrl = Annotated[str, WithJsonSchema({"type": "string", "format": "uri", "minLength": 1, "maxLength": 2083})]
+
+# 301 and 308 are permanent, 302 and 307 temporary
+RedirectType = Literal[301, 302, 307, 308]
 
 
 class LinkBase(BaseModel):
@@ -11,6 +20,8 @@ class LinkBase(BaseModel):
 class LinkCreate(LinkBase):
     custom_alias: Optional[str] = None
     expires_at: Optional[datetime] = None
+    redirect_type: RedirectType = DEFAULT_REDIRECT_TYPE
+    reuse_existing: bool = False
 
     @field_validator("custom_alias")
     def validate_custom_alias(cls, v):
@@ -21,28 +32,78 @@ class LinkCreate(LinkBase):
                 raise ValueError("Custom alias must contain only alphanumeric characters")
         return v
 
+    @field_validator("expires_at")
+    def validate_expires_at(cls, v):
+        if v is not None and v <= datetime.now(v.tzinfo):
+            raise ValueError("Expiration date must be in the future")
+        return v
+
 
 class LinkUpdate(BaseModel):
     original_url: HttpUrl
     expires_at: Optional[datetime] = None
+    redirect_type: Optional[RedirectType] = None
 
 
 class LinkResponse(BaseModel):
     short_code: str
-    original_url: HttpUrl
+    original_url: StoredUrl
     created_at: datetime
     expires_at: Optional[datetime] = None
     custom_alias: bool
+    redirect_type: int
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: int
+    link: Optional[LinkResponse] = None
+    detail: Optional[Any] = None
 
 
 class LinkStats(BaseModel):
     short_code: str
-    original_url: HttpUrl
+    original_url: StoredUrl
     created_at: datetime
     visit_count: int
+    unique_visitors: Optional[int] = None
+    first_visited_at: Optional[datetime] = None
     last_visited_at: Optional[datetime] = None
 
 
 class LinkSearchResponse(BaseModel):
-    original_url: HttpUrl
+    original_url: Optional[HttpUrl] = None
+    domain: Optional[str] = None
+    prefix: Optional[str] = None
     links: List[LinkResponse]
+    next_cursor: Optional[str] = None
+
+
+class ExpiredLinkResponse(BaseModel):
+    short_code: str
+    original_url: StoredUrl
+    created_at: datetime
+    expires_at: datetime
+    expired_at: datetime
+    custom_alias: bool
+    visit_count: int
+    last_visited_at: Optional[datetime] = None
+
+
+class ExpiredLinksResponse(BaseModel):
+    links: List[ExpiredLinkResponse]
+    next_cursor: Optional[str] = None
+
+
+class VisitBucket(BaseModel):
+    bucket: datetime
+    visit_count: int
+    unique_visitors: Optional[int] = None
+
+
+class LinkTimeseries(BaseModel):
+    short_code: str
+    granularity: Literal["hour", "day"]
+    start: datetime
+    end: datetime
+    buckets: List[VisitBucket]
@@ -1 +1,5 @@
+from .asyncpg_repository import AsyncpgLinkRepository as AsyncpgLinkRepository
 from .repository import LinkRepository as LinkRepository
+from .sharded_repository import ShardedLinkRepository as ShardedLinkRepository
+from .sharded_repository import UnrecordedVisitsError as UnrecordedVisitsError
+from .sharded_repository import open_link_repository as open_link_repository
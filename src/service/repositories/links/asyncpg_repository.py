@@ -0,0 +1,63 @@
+from typing import Optional
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.core.metrics import QueryTimer
+from service.models.domain.link import Link
+from service.models.domain.visit import LinkCounters
+from service.repositories.links.repository import LinkRepository
+
+
+GET_BY_SHORT_CODE_QUERY = """
+    SELECT id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
+    FROM links
+    WHERE short_code = $1
+"""
+
+GET_COUNTERS_QUERY = """
+    SELECT visit_count, first_visited_at, last_visited_at
+    FROM link_counters
+    WHERE link_id = $1
+"""
+
+
+class AsyncpgLinkRepository(LinkRepository):
+    """LinkRepository that serves the redirect and stats lookups straight from asyncpg pools.
+
+    The queries skip SQLAlchemy's statement compilation and result wrapping and run as
+    prepared statements cached on each pooled connection. Everything else goes through the
+    sessions as in LinkRepository.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        read_db: Optional[AsyncSession] = None,
+        pool: Optional[asyncpg.Pool] = None,
+        read_pool: Optional[asyncpg.Pool] = None,
+    ):
+        super().__init__(db, read_db)
+        self.pool = pool
+        self.read_pool = read_pool if read_pool is not None else pool
+
+    async def get_by_short_code(self, short_code: str, consistent: bool = False) -> Optional[Link]:
+        """Get a link by its short code"""
+        pool = self.pool if consistent else self.read_pool
+        with QueryTimer():
+            row = await pool.fetchrow(GET_BY_SHORT_CODE_QUERY, short_code)
+
+        if not row:
+            return None
+
+        return Link(*row)
+
+    async def get_counters(self, link_id: int) -> LinkCounters:
+        """Get the visit counters of a link"""
+        with QueryTimer():
+            row = await self.read_pool.fetchrow(GET_COUNTERS_QUERY, link_id)
+
+        if not row:
+            return LinkCounters()
+
+        return LinkCounters(*row)
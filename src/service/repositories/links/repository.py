@@ -1,24 +1,51 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from service.models.domain.link import Link
+from service.common.url_normalizer import url_digest, url_host
+from service.models.domain.link import DEFAULT_REDIRECT_TYPE, ExpiredLink, Link
+from service.models.domain.visit import LinkCounters, VisitEvent
+
+
+URL_PREFIX_INDEX_LENGTH = 512
 
 
 class LinkRepository:
-    def __init__(self, db: AsyncSession):
+    """Data access for links and visits.
+
+    Writes always go to `db`. Reads that tolerate replication lag go to `read_db`, which
+    defaults to `db`; pass `consistent=True` to read from `db` instead.
+    """
+
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
         self.db = db
+        self.read_db = read_db if read_db is not None else db
+
+    def _reader(self, consistent: bool) -> AsyncSession:
+        return self.db if consistent else self.read_db
+
+    async def locate(self, short_code: str, consistent: bool = False) -> Tuple["LinkRepository", Optional[Link]]:
+        """Get a link by its short code together with the repository holding it, for follow-up calls by link ID"""
+        return self, await self.get_by_short_code(short_code, consistent)
 
     async def create(
-        self, short_code: str, original_url: str, custom_alias: bool = False, expires_at: Optional[datetime] = None
-    ) -> Link:
-        """Create a new link in the database"""
+        self,
+        short_code: str,
+        original_url: str,
+        custom_alias: bool = False,
+        expires_at: Optional[datetime] = None,
+        redirect_type: int = DEFAULT_REDIRECT_TYPE,
+    ) -> Optional[Link]:
+        """Create a new link in the database, returning None if the short code is already taken"""
         query = text("""
-            INSERT INTO links (short_code, original_url, custom_alias, expires_at)
-            VALUES (:short_code, :original_url, :custom_alias, :expires_at)
-            RETURNING id, short_code, original_url, custom_alias, created_at, expires_at
+            INSERT INTO links (
+                short_code, original_url, original_url_hash, host, custom_alias, expires_at, redirect_type
+            )
+            VALUES (:short_code, :original_url, :original_url_hash, :host, :custom_alias, :expires_at, :redirect_type)
+            ON CONFLICT (short_code) DO NOTHING
+            RETURNING id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
         """)
 
         result = await self.db.execute(
@@ -26,33 +53,111 @@ class LinkRepository:
             {
                 "short_code": short_code,
                 "original_url": original_url,
+                "original_url_hash": url_digest(original_url),
+                "host": url_host(original_url),
                 "custom_alias": custom_alias,
                 "expires_at": expires_at,
+                "redirect_type": redirect_type,
             },
         )
+        row = result.fetchone()
         await self.db.commit()
 
-        row = result.fetchone()
+        if not row:
+            return None
+
         return Link(
-            id=row[0], short_code=row[1], original_url=row[2], custom_alias=row[3], created_at=row[4], expires_at=row[5]
+            id=row[0],
+            short_code=row[1],
+            original_url=row[2],
+            custom_alias=row[3],
+            created_at=row[4],
+            expires_at=row[5],
+            redirect_type=row[6],
         )
 
-    async def get_by_short_code(self, short_code: str) -> Optional[Link]:
+    async def create_many(self, links: Sequence[Tuple[str, str, bool, Optional[datetime], int]]) -> List[Link]:
+        """Create links from (short_code, original_url, custom_alias, expires_at, redirect_type) tuples at once.
+
+        Links whose short code is already taken are skipped and missing from the result.
+        """
+        query = text("""
+            INSERT INTO links (
+                short_code, original_url, original_url_hash, host, custom_alias, expires_at, redirect_type
+            )
+            SELECT *
+            FROM unnest(
+                CAST(:short_codes AS VARCHAR(16)[]),
+                CAST(:original_urls AS TEXT[]),
+                CAST(:original_url_hashes AS BYTEA[]),
+                CAST(:hosts AS TEXT[]),
+                CAST(:custom_aliases AS BOOLEAN[]),
+                CAST(:expires_at AS TIMESTAMPTZ[]),
+                CAST(:redirect_types AS SMALLINT[])
+            )
+            ON CONFLICT (short_code) DO NOTHING
+            RETURNING id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
+        """)
+
+        result = await self.db.execute(
+            query,
+            {
+                "short_codes": [link[0] for link in links],
+                "original_urls": [link[1] for link in links],
+                "original_url_hashes": [url_digest(link[1]) for link in links],
+                "hosts": [url_host(link[1]) for link in links],
+                "custom_aliases": [link[2] for link in links],
+                "expires_at": [link[3] for link in links],
+                "redirect_types": [link[4] for link in links],
+            },
+        )
+        rows = result.fetchall()
+        await self.db.commit()
+
+        return [
+            Link(
+                id=row[0],
+                short_code=row[1],
+                original_url=row[2],
+                custom_alias=row[3],
+                created_at=row[4],
+                expires_at=row[5],
+                redirect_type=row[6],
+            )
+            for row in rows
+        ]
+
+    async def reserve_code_ids(self, count: int) -> List[int]:
+        """Reserve a block of IDs for short code generation"""
+        query = text("""
+            SELECT nextval('short_code_id_seq') FROM generate_series(1, :count)
+        """)
+
+        result = await self.db.execute(query, {"count": count})
+        return [row[0] for row in result.fetchall()]
+
+    async def get_by_short_code(self, short_code: str, consistent: bool = False) -> Optional[Link]:
         """Get a link by its short code"""
         query = text("""
-            SELECT id, short_code, original_url, custom_alias, created_at, expires_at
+            SELECT id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
             FROM links
             WHERE short_code = :short_code
         """)
 
-        result = await self.db.execute(query, {"short_code": short_code})
+        result = await self._reader(consistent).execute(query, {"short_code": short_code})
         row = result.fetchone()
 
         if not row:
             return None
 
         return Link(
-            id=row[0], short_code=row[1], original_url=row[2], custom_alias=row[3], created_at=row[4], expires_at=row[5]
+            id=row[0],
+            short_code=row[1],
+            original_url=row[2],
+            custom_alias=row[3],
+            created_at=row[4],
+            expires_at=row[5],
+            redirect_type=row[6],
         )
 
     async def exists_by_short_code(self, short_code: str) -> bool:
@@ -74,87 +179,470 @@ class LinkRepository:
         await self.db.execute(query, {"link_id": link_id})
         await self.db.commit()
 
-    async def update(self, link_id: int, original_url: str, expires_at: Optional[datetime] = None) -> Link:
-        """Update a link's original URL and/or expiration date"""
+    async def update(
+        self,
+        link_id: int,
+        original_url: str,
+        expires_at: Optional[datetime] = None,
+        redirect_type: int = DEFAULT_REDIRECT_TYPE,
+    ) -> Optional[Link]:
+        """Update a link's original URL, expiration date and redirect type, returning None if it no longer exists"""
         query = text("""
             UPDATE links
             SET original_url = :original_url,
-                expires_at = :expires_at
+                original_url_hash = :original_url_hash,
+                host = :host,
+                expires_at = :expires_at,
+                redirect_type = :redirect_type
             WHERE id = :link_id
-            RETURNING id, short_code, original_url, custom_alias, created_at, expires_at
+            RETURNING id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
         """)
 
         result = await self.db.execute(
-            query, {"link_id": link_id, "original_url": original_url, "expires_at": expires_at}
+            query,
+            {
+                "link_id": link_id,
+                "original_url": original_url,
+                "original_url_hash": url_digest(original_url),
+                "host": url_host(original_url),
+                "expires_at": expires_at,
+                "redirect_type": redirect_type,
+            },
         )
         await self.db.commit()
 
         row = result.fetchone()
+        if not row:
+            return None
+
         return Link(
-            id=row[0], short_code=row[1], original_url=row[2], custom_alias=row[3], created_at=row[4], expires_at=row[5]
+            id=row[0],
+            short_code=row[1],
+            original_url=row[2],
+            custom_alias=row[3],
+            created_at=row[4],
+            expires_at=row[5],
+            redirect_type=row[6],
         )
 
-    async def record_visit(
-        self,
-        link_id: int,
-        user_agent: Optional[str] = None,
-        ip_address: Optional[str] = None,
-        referrer: Optional[str] = None,
-    ) -> None:
-        """Record a visit to a link"""
-        query = text("""
-            INSERT INTO link_visits (link_id, user_agent, ip_address, referrer)
-            VALUES (:link_id, :user_agent, :ip_address, :referrer)
+    async def record_visits(self, visits: Sequence[VisitEvent]) -> None:
+        """Record a batch of visits and fold it into the hourly rollups and per-link counters.
+
+        Everything is written in one transaction. Visits to links that were deleted in the
+        meantime are skipped.
+        """
+        visits_query = text("""
+            INSERT INTO link_visits (link_id, visited_at, user_agent, ip_address, referrer)
+            SELECT v.link_id, v.visited_at, v.user_agent, v.ip_address, v.referrer
+            FROM unnest(
+                CAST(:link_ids AS BIGINT[]),
+                CAST(:visited_at AS TIMESTAMPTZ[]),
+                CAST(:user_agents AS TEXT[]),
+                CAST(:ip_addresses AS TEXT[]),
+                CAST(:referrers AS TEXT[])
+            ) AS v (link_id, visited_at, user_agent, ip_address, referrer)
+            JOIN links l ON l.id = v.link_id
+        """)
+        rollups_query = text("""
+            INSERT INTO link_visits_hourly (link_id, bucket, visit_count, first_visited_at, last_visited_at)
+            SELECT r.link_id, r.bucket, r.visit_count, r.first_visited_at, r.last_visited_at
+            FROM unnest(
+                CAST(:link_ids AS BIGINT[]),
+                CAST(:buckets AS TIMESTAMPTZ[]),
+                CAST(:visit_counts AS BIGINT[]),
+                CAST(:first_visited_at AS TIMESTAMPTZ[]),
+                CAST(:last_visited_at AS TIMESTAMPTZ[])
+            ) AS r (link_id, bucket, visit_count, first_visited_at, last_visited_at)
+            JOIN links l ON l.id = r.link_id
+            ORDER BY r.link_id, r.bucket
+            ON CONFLICT (link_id, bucket) DO UPDATE
+            SET visit_count = link_visits_hourly.visit_count + EXCLUDED.visit_count,
+                first_visited_at = LEAST(link_visits_hourly.first_visited_at, EXCLUDED.first_visited_at),
+                last_visited_at = GREATEST(link_visits_hourly.last_visited_at, EXCLUDED.last_visited_at)
         """)
+        counters_query = text("""
+            INSERT INTO link_counters (link_id, visit_count, first_visited_at, last_visited_at)
+            SELECT c.link_id, c.visit_count, c.first_visited_at, c.last_visited_at
+            FROM unnest(
+                CAST(:link_ids AS BIGINT[]),
+                CAST(:visit_counts AS BIGINT[]),
+                CAST(:first_visited_at AS TIMESTAMPTZ[]),
+                CAST(:last_visited_at AS TIMESTAMPTZ[])
+            ) AS c (link_id, visit_count, first_visited_at, last_visited_at)
+            JOIN links l ON l.id = c.link_id
+            ORDER BY c.link_id
+            ON CONFLICT (link_id) DO UPDATE
+            SET visit_count = link_counters.visit_count + EXCLUDED.visit_count,
+                first_visited_at = LEAST(link_counters.first_visited_at, EXCLUDED.first_visited_at),
+                last_visited_at = GREATEST(link_counters.last_visited_at, EXCLUDED.last_visited_at)
+        """)
+
+        rollups = {}
+        counters = {}
+        for visit in visits:
+            bucket = visit.visited_at.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+            for aggregates, key in ((rollups, (visit.link_id, bucket)), (counters, visit.link_id)):
+                counter = aggregates.get(key)
+                if counter is None:
+                    aggregates[key] = LinkCounters(1, visit.visited_at, visit.visited_at)
+                else:
+                    counter.visit_count += 1
+                    counter.first_visited_at = min(counter.first_visited_at, visit.visited_at)
+                    counter.last_visited_at = max(counter.last_visited_at, visit.visited_at)
 
         await self.db.execute(
-            query, {"link_id": link_id, "user_agent": user_agent, "ip_address": ip_address, "referrer": referrer}
+            visits_query,
+            {
+                "link_ids": [visit.link_id for visit in visits],
+                "visited_at": [visit.visited_at for visit in visits],
+                "user_agents": [visit.user_agent for visit in visits],
+                "ip_addresses": [visit.ip_address for visit in visits],
+                "referrers": [visit.referrer for visit in visits],
+            },
+        )
+        await self.db.execute(
+            rollups_query,
+            {
+                "link_ids": [link_id for link_id, _ in rollups],
+                "buckets": [bucket for _, bucket in rollups],
+                "visit_counts": [counter.visit_count for counter in rollups.values()],
+                "first_visited_at": [counter.first_visited_at for counter in rollups.values()],
+                "last_visited_at": [counter.last_visited_at for counter in rollups.values()],
+            },
+        )
+        await self.db.execute(
+            counters_query,
+            {
+                "link_ids": list(counters),
+                "visit_counts": [counter.visit_count for counter in counters.values()],
+                "first_visited_at": [counter.first_visited_at for counter in counters.values()],
+                "last_visited_at": [counter.last_visited_at for counter in counters.values()],
+            },
         )
         await self.db.commit()
 
-    async def get_visit_count(self, link_id: int) -> int:
-        """Get the number of visits for a link"""
+    async def get_counters(self, link_id: int) -> LinkCounters:
+        """Get the visit counters of a link"""
         query = text("""
-            SELECT COUNT(*) FROM link_visits
+            SELECT visit_count, first_visited_at, last_visited_at
+            FROM link_counters
             WHERE link_id = :link_id
         """)
 
-        result = await self.db.execute(query, {"link_id": link_id})
-        return result.scalar()
+        result = await self.read_db.execute(query, {"link_id": link_id})
+        row = result.fetchone()
+
+        if not row:
+            return LinkCounters()
+
+        return LinkCounters(visit_count=row[0], first_visited_at=row[1], last_visited_at=row[2])
+
+    async def get_most_visited(self, limit: int) -> List[Link]:
+        """Get the live links with the most visits, most visited first"""
+        query = text("""
+            SELECT l.id, l.short_code, l.original_url, l.custom_alias, l.created_at, l.expires_at, l.redirect_type
+            FROM link_counters c
+            JOIN links l ON l.id = c.link_id
+            WHERE l.expires_at IS NULL OR l.expires_at > NOW()
+            ORDER BY c.visit_count DESC
+            LIMIT :limit
+        """)
+
+        result = await self.read_db.execute(query, {"limit": limit})
+        rows = result.fetchall()
+
+        return [
+            Link(
+                id=row[0],
+                short_code=row[1],
+                original_url=row[2],
+                custom_alias=row[3],
+                created_at=row[4],
+                expires_at=row[5],
+                redirect_type=row[6],
+            )
+            for row in rows
+        ]
+
+    async def rebuild_counters(self, link_id: Optional[int] = None) -> int:
+        """Recompute visit counters from the hourly rollups, for one link or for all of them.
+
+        The rollups are used rather than link_visits because raw visits are dropped after the
+        retention window. Counter updates from concurrent visit flushes wait until the rebuild
+        commits, so no increment is lost or applied twice.
+        """
+        lock_query = text("LOCK TABLE link_counters IN SHARE ROW EXCLUSIVE MODE")
+        rebuild_query = text("""
+            INSERT INTO link_counters (link_id, visit_count, first_visited_at, last_visited_at)
+            SELECT link_id, SUM(visit_count), MIN(first_visited_at), MAX(last_visited_at)
+            FROM link_visits_hourly
+            WHERE CAST(:link_id AS BIGINT) IS NULL OR link_id = :link_id
+            GROUP BY link_id
+            ON CONFLICT (link_id) DO UPDATE
+            SET visit_count = EXCLUDED.visit_count,
+                first_visited_at = EXCLUDED.first_visited_at,
+                last_visited_at = EXCLUDED.last_visited_at
+        """)
+        cleanup_query = text("""
+            DELETE FROM link_counters c
+            WHERE (CAST(:link_id AS BIGINT) IS NULL OR c.link_id = :link_id)
+              AND NOT EXISTS (SELECT 1 FROM link_visits_hourly h WHERE h.link_id = c.link_id)
+        """)
+
+        await self.db.execute(lock_query)
+        result = await self.db.execute(rebuild_query, {"link_id": link_id})
+        await self.db.execute(cleanup_query, {"link_id": link_id})
+        await self.db.commit()
 
-    async def get_last_visit(self, link_id: int) -> Optional[datetime]:
-        """Get the timestamp of the last visit for a link"""
+        return result.rowcount
+
+    async def get_visit_timeseries(
+        self, link_id: int, start: datetime, end: datetime, granularity: str
+    ) -> List[Tuple[datetime, int]]:
+        """Get visit counts of a link per hour or day in [start, end) from the hourly rollups"""
         query = text("""
-            SELECT visited_at FROM link_visits
+            SELECT date_trunc(:granularity, bucket, 'UTC') AS period, SUM(visit_count)
+            FROM link_visits_hourly
             WHERE link_id = :link_id
-            ORDER BY visited_at DESC
+              AND bucket >= :start
+              AND bucket < :end
+            GROUP BY period
+            ORDER BY period
+        """)
+
+        result = await self.read_db.execute(
+            query, {"link_id": link_id, "start": start, "end": end, "granularity": granularity}
+        )
+        return [(row[0], row[1]) for row in result.fetchall()]
+
+    async def create_visit_partitions(self, days_ahead: int) -> int:
+        """Make sure daily link_visits partitions exist from today up to `days_ahead` days ahead"""
+        query = text("SELECT create_link_visits_partitions(CAST(timezone('UTC', NOW()) AS DATE), :days)")
+
+        result = await self.db.execute(query, {"days": days_ahead + 1})
+        await self.db.commit()
+        return result.scalar()
+
+    async def drop_visit_partitions(self, retention_days: int) -> int:
+        """Drop daily link_visits partitions older than the retention window"""
+        query = text("""
+            SELECT drop_link_visits_partitions(CAST(timezone('UTC', NOW()) AS DATE) - :retention_days)
+        """)
+
+        result = await self.db.execute(query, {"retention_days": retention_days})
+        await self.db.commit()
+        return result.scalar()
+
+    async def search(
+        self,
+        original_url: Optional[str] = None,
+        host: Optional[str] = None,
+        prefix: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50,
+    ) -> List[Link]:
+        """Find links by equivalent original URL, host and/or URL prefix, newest first.
+
+        Pages are delimited by the (created_at, id) of the last link of the previous page, passed
+        as `before`. Prefixes are matched through an index on the first URL_PREFIX_INDEX_LENGTH
+        characters of the URL, as a range on that index rather than LIKE, so that the index is
+        used with bound parameters as well.
+        """
+        conditions = []
+        params: Dict[str, Any] = {"limit": limit}
+        if original_url is not None:
+            conditions.append("original_url_hash = :original_url_hash")
+            params["original_url_hash"] = url_digest(original_url)
+        if host is not None:
+            conditions.append("host = :host")
+            params["host"] = host
+        if prefix:
+            indexed_prefix = prefix[:URL_PREFIX_INDEX_LENGTH]
+            conditions.append(f"""
+                left(original_url, {URL_PREFIX_INDEX_LENGTH}) ~>=~ :prefix_low
+                AND left(original_url, {URL_PREFIX_INDEX_LENGTH}) ~<~ :prefix_high
+                AND starts_with(original_url, :prefix)
+            """)
+            params["prefix"] = prefix
+            params["prefix_low"] = indexed_prefix
+            params["prefix_high"] = indexed_prefix[:-1] + chr(ord(indexed_prefix[-1]) + 1)
+        if before is not None:
+            conditions.append("(created_at, id) < (:before_created_at, :before_id)")
+            params["before_created_at"], params["before_id"] = before
+
+        query = text(f"""
+            SELECT id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
+            FROM links
+            WHERE {" AND ".join(conditions) or "TRUE"}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit
+        """)
+
+        result = await self.read_db.execute(query, params)
+        rows = result.fetchall()
+
+        return [
+            Link(
+                id=row[0],
+                short_code=row[1],
+                original_url=row[2],
+                custom_alias=row[3],
+                created_at=row[4],
+                expires_at=row[5],
+                redirect_type=row[6],
+            )
+            for row in rows
+        ]
+
+    async def find_reusable(
+        self, original_url: str, expires_at: Optional[datetime] = None, redirect_type: int = DEFAULT_REDIRECT_TYPE
+    ) -> Optional[Link]:
+        """Find a live generated (non-custom) link for an equivalent URL with the same expiry and redirect type"""
+        query = text("""
+            SELECT id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
+            FROM links
+            WHERE original_url_hash = :original_url_hash
+              AND NOT custom_alias
+              AND expires_at IS NOT DISTINCT FROM :expires_at
+              AND redirect_type = :redirect_type
+              AND (expires_at IS NULL OR expires_at > NOW())
+            ORDER BY created_at
             LIMIT 1
         """)
 
-        result = await self.db.execute(query, {"link_id": link_id})
+        result = await self.db.execute(
+            query,
+            {"original_url_hash": url_digest(original_url), "expires_at": expires_at, "redirect_type": redirect_type},
+        )
         row = result.fetchone()
 
-        return row[0] if row else None
+        if not row:
+            return None
+
+        return Link(
+            id=row[0],
+            short_code=row[1],
+            original_url=row[2],
+            custom_alias=row[3],
+            created_at=row[4],
+            expires_at=row[5],
+            redirect_type=row[6],
+        )
+
+    async def backfill_url_hashes(self, after_id: int, batch_size: int) -> Optional[Tuple[int, int, int]]:
+        """Fill in missing original URL digests for the next `batch_size` links after `after_id`.
+
+        Returns the last processed link ID with the number of links processed and filled in,
+        or None once there are no links left.
+        """
+        select_query = text("""
+            SELECT id, original_url, original_url_hash IS NULL
+            FROM links
+            WHERE id > :after_id
+            ORDER BY id
+            LIMIT :batch_size
+        """)
+        update_query = text("""
+            UPDATE links
+            SET original_url_hash = v.original_url_hash
+            FROM unnest(CAST(:ids AS BIGINT[]), CAST(:hashes AS BYTEA[])) AS v (id, original_url_hash)
+            WHERE links.id = v.id
+        """)
+
+        result = await self.db.execute(select_query, {"after_id": after_id, "batch_size": batch_size})
+        rows = result.fetchall()
+        missing = [row for row in rows if row[2]]
+        if missing:
+            await self.db.execute(
+                update_query, {"ids": [row[0] for row in missing], "hashes": [url_digest(row[1]) for row in missing]}
+            )
+        await self.db.commit()
+
+        return (rows[-1][0], len(rows), len(missing)) if rows else None
 
-    async def find_by_original_url(self, original_url: str) -> List[Link]:
-        """Find links by original URL"""
+    async def list_short_codes(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """List the IDs and short codes of up to `limit` links after `after_id`, in ID order.
+
+        Reads from the primary, so that a short code filter built from it misses no recent link.
+        """
         query = text("""
-            SELECT id, short_code, original_url, custom_alias, created_at, expires_at
+            SELECT id, short_code
             FROM links
-            WHERE original_url = :original_url
+            WHERE id > :after_id
+            ORDER BY id
+            LIMIT :limit
         """)
 
-        result = await self.db.execute(query, {"original_url": original_url})
+        result = await self.db.execute(query, {"after_id": after_id, "limit": limit})
+        return [(row[0], row[1]) for row in result.fetchall()]
+
+    async def archive_expired(self, batch_size: int) -> List[str]:
+        """Move up to `batch_size` expired links into expired_links, returning their short codes.
+
+        Rows locked by another sweeper are skipped, so several workers can sweep at once. The
+        archive keeps the visit counters the link had when it was removed.
+        """
+        query = text("""
+            WITH expired AS (
+                DELETE FROM links
+                WHERE id IN (
+                    SELECT id
+                    FROM links
+                    WHERE expires_at <= NOW()
+                    ORDER BY expires_at
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, short_code, original_url, original_url_hash, host, custom_alias, created_at, expires_at
+            )
+            INSERT INTO expired_links (
+                id, short_code, original_url, original_url_hash, host, custom_alias, created_at, expires_at,
+                visit_count, last_visited_at
+            )
+            SELECT e.id, e.short_code, e.original_url, e.original_url_hash, e.host, e.custom_alias, e.created_at,
+                   e.expires_at, COALESCE(c.visit_count, 0), c.last_visited_at
+            FROM expired e
+            LEFT JOIN link_counters c ON c.link_id = e.id
+            RETURNING short_code
+        """)
+
+        result = await self.db.execute(query, {"batch_size": batch_size})
+        short_codes = [row[0] for row in result.fetchall()]
+        await self.db.commit()
+
+        return short_codes
+
+    async def list_expired(self, before: Optional[Tuple[datetime, int]] = None, limit: int = 50) -> List[ExpiredLink]:
+        """List archived expired links, most recently expired first, after the (expired_at, id) of `before`"""
+        conditions = []
+        params: Dict[str, Any] = {"limit": limit}
+        if before is not None:
+            conditions.append("(expired_at, id) < (:before_expired_at, :before_id)")
+            params["before_expired_at"], params["before_id"] = before
+
+        query = text(f"""
+            SELECT id, short_code, original_url, custom_alias, created_at, expires_at, expired_at, visit_count,
+                   last_visited_at
+            FROM expired_links
+            WHERE {" AND ".join(conditions) or "TRUE"}
+            ORDER BY expired_at DESC, id DESC
+            LIMIT :limit
+        """)
+
+        result = await self.read_db.execute(query, params)
         rows = result.fetchall()
 
         return [
-            Link(
+            ExpiredLink(
                 id=row[0],
                 short_code=row[1],
                 original_url=row[2],
                 custom_alias=row[3],
                 created_at=row[4],
                 expires_at=row[5],
+                expired_at=row[6],
+                visit_count=row[7],
+                last_visited_at=row[8],
             )
             for row in rows
         ]
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.core.config import settings
+from service.db.postgres import ShardSet, async_session, shards
+from service.models.domain.link import DEFAULT_REDIRECT_TYPE, ExpiredLink, Link
+from service.models.domain.visit import LinkCounters, VisitEvent
+
+from .repository import LinkRepository
+
+
+class UnrecordedVisitsError(Exception):
+    """Raised when some shards failed to record their visits; `visits` are the ones not recorded"""
+
+    def __init__(self, visits: List[VisitEvent]):
+        super().__init__(f"{len(visits)} visits were not recorded")
+        self.visits = visits
+
+
+class ShardedLinkRepository(LinkRepository):
+    """LinkRepository over links spread across several databases, one repository per shard.
+
+    Calls about one short code go to the shard its slot belongs to, so no directory is needed.
+    Searches, expiry and maintenance run on every shard at once and merge the results. Code IDs
+    are reserved on the first shard only, which keeps generated codes unique across shards.
+
+    Link IDs are unique across shards (see `python -m service.tools.shards init`), so calls by
+    link ID are sent to every shard and only the shard holding the link acts on them; callers
+    that know the short code should use `locate` and call the repository it returns instead.
+    While `rebalancing`, links not found on their shard are looked up on the others, since the
+    rebalancing tool may not have moved them yet, and visits are written to every shard.
+    """
+
+    def __init__(
+        self,
+        repositories: Sequence[LinkRepository],
+        shard_set: ShardSet = shards,
+        rebalancing: bool = settings.SHARD_REBALANCING,
+    ):
+        super().__init__(repositories[0].db, repositories[0].read_db)
+        self.repositories = list(repositories)
+        self.shard_set = shard_set
+        self.rebalancing = rebalancing
+
+    def _for_code(self, short_code: str) -> LinkRepository:
+        return self.repositories[self.shard_set.shard_of(short_code)]
+
+    async def locate(self, short_code: str, consistent: bool = False) -> Tuple[LinkRepository, Optional[Link]]:
+        repository = self._for_code(short_code)
+        link = await repository.get_by_short_code(short_code, consistent)
+        if link is not None or not self.rebalancing:
+            return repository, link
+
+        others = [other for other in self.repositories if other is not repository]
+        links = await asyncio.gather(*(other.get_by_short_code(short_code, consistent) for other in others))
+        for other, link in zip(others, links, strict=True):
+            if link is not None:
+                return other, link
+        return repository, None
+
+    async def create(
+        self,
+        short_code: str,
+        original_url: str,
+        custom_alias: bool = False,
+        expires_at: Optional[datetime] = None,
+        redirect_type: int = DEFAULT_REDIRECT_TYPE,
+    ) -> Optional[Link]:
+        if self.rebalancing and await self.exists_by_short_code(short_code):
+            return None
+        return await self._for_code(short_code).create(
+            short_code, original_url, custom_alias, expires_at, redirect_type
+        )
+
+    async def create_many(self, links: Sequence[Tuple[str, str, bool, Optional[datetime], int]]) -> List[Link]:
+        if self.rebalancing:
+            taken = {link[0] for link in links if link[2] and await self.exists_by_short_code(link[0])}
+            links = [link for link in links if link[0] not in taken]
+
+        by_shard: Dict[int, List[Tuple[str, str, bool, Optional[datetime], int]]] = {}
+        for link in links:
+            by_shard.setdefault(self.shard_set.shard_of(link[0]), []).append(link)
+        created = await asyncio.gather(
+            *(self.repositories[shard].create_many(shard_links) for shard, shard_links in by_shard.items())
+        )
+        return list(itertools.chain.from_iterable(created))
+
+    async def reserve_code_ids(self, count: int) -> List[int]:
+        return await self.repositories[0].reserve_code_ids(count)
+
+    async def get_by_short_code(self, short_code: str, consistent: bool = False) -> Optional[Link]:
+        _, link = await self.locate(short_code, consistent)
+        return link
+
+    async def exists_by_short_code(self, short_code: str) -> bool:
+        if not self.rebalancing:
+            return await self._for_code(short_code).exists_by_short_code(short_code)
+        return any(
+            await asyncio.gather(*(repository.exists_by_short_code(short_code) for repository in self.repositories))
+        )
+
+    async def delete(self, link_id: int) -> None:
+        await asyncio.gather(*(repository.delete(link_id) for repository in self.repositories))
+
+    async def update(
+        self,
+        link_id: int,
+        original_url: str,
+        expires_at: Optional[datetime] = None,
+        redirect_type: int = DEFAULT_REDIRECT_TYPE,
+    ) -> Optional[Link]:
+        links = await asyncio.gather(
+            *(repository.update(link_id, original_url, expires_at, redirect_type) for repository in self.repositories)
+        )
+        return next((link for link in links if link is not None), None)
+
+    async def record_visits(self, visits: Sequence[VisitEvent]) -> None:
+        """Write each visit to the shard of its short code, or every visit to every shard while rebalancing.
+
+        Raises UnrecordedVisitsError with the visits of the shards that failed, so that only
+        those are retried.
+        """
+        if self.rebalancing or any(visit.short_code is None for visit in visits):
+            await asyncio.gather(*(repository.record_visits(visits) for repository in self.repositories))
+            return
+
+        by_shard: Dict[int, List[VisitEvent]] = {}
+        for visit in visits:
+            by_shard.setdefault(self.shard_set.shard_of(visit.short_code), []).append(visit)
+        results = await asyncio.gather(
+            *(self.repositories[shard].record_visits(shard_visits) for shard, shard_visits in by_shard.items()),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if not errors:
+            return
+        if not isinstance(errors[0], Exception):
+            raise errors[0]
+        unrecorded = [
+            visit
+            for shard_visits, result in zip(by_shard.values(), results, strict=True)
+            if isinstance(result, BaseException)
+            for visit in shard_visits
+        ]
+        raise UnrecordedVisitsError(unrecorded) from errors[0]
+
+    async def get_counters(self, link_id: int) -> LinkCounters:
+        counters = await asyncio.gather(*(repository.get_counters(link_id) for repository in self.repositories))
+        return max(counters, key=lambda counter: counter.visit_count)
+
+    async def get_most_visited(self, limit: int) -> List[Link]:
+        """Get the most visited links of every shard, interleaved by their rank within the shard"""
+        ranked = await asyncio.gather(*(repository.get_most_visited(limit) for repository in self.repositories))
+        links = itertools.chain.from_iterable(itertools.zip_longest(*ranked))
+        return [link for link in links if link is not None][:limit]
+
+    async def rebuild_counters(self, link_id: Optional[int] = None) -> int:
+        return sum(await asyncio.gather(*(repository.rebuild_counters(link_id) for repository in self.repositories)))
+
+    async def get_visit_timeseries(
+        self, link_id: int, start: datetime, end: datetime, granularity: str
+    ) -> List[Tuple[datetime, int]]:
+        series = await asyncio.gather(
+            *(repository.get_visit_timeseries(link_id, start, end, granularity) for repository in self.repositories)
+        )
+        return list(heapq.merge(*series))
+
+    async def create_visit_partitions(self, days_ahead: int) -> int:
+        return sum(
+            await asyncio.gather(*(repository.create_visit_partitions(days_ahead) for repository in self.repositories))
+        )
+
+    async def drop_visit_partitions(self, retention_days: int) -> int:
+        return sum(
+            await asyncio.gather(
+                *(repository.drop_visit_partitions(retention_days) for repository in self.repositories)
+            )
+        )
+
+    async def search(
+        self,
+        original_url: Optional[str] = None,
+        host: Optional[str] = None,
+        prefix: Optional[str] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 50,
+    ) -> List[Link]:
+        """Search every shard for a page and merge the pages, newest first"""
+        pages = await asyncio.gather(
+            *(repository.search(original_url, host, prefix, before, limit) for repository in self.repositories)
+        )
+        merged = heapq.merge(*pages, key=lambda link: (link.created_at, link.id), reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    async def find_reusable(
+        self, original_url: str, expires_at: Optional[datetime] = None, redirect_type: int = DEFAULT_REDIRECT_TYPE
+    ) -> Optional[Link]:
+        """Find the oldest reusable link for an equivalent URL across all shards"""
+        links = await asyncio.gather(
+            *(repository.find_reusable(original_url, expires_at, redirect_type) for repository in self.repositories)
+        )
+        return min((link for link in links if link is not None), key=lambda link: link.created_at, default=None)
+
+    async def backfill_url_hashes(self, after_id: int, batch_size: int) -> Optional[Tuple[int, int, int]]:
+        """Backfill the next batch on every shard, returning the lowest last processed ID so no shard skips links.
+
+        Links past that ID on the other shards are processed again by the next call, and counted again.
+        """
+        results = await asyncio.gather(
+            *(repository.backfill_url_hashes(after_id, batch_size) for repository in self.repositories)
+        )
+        results = [result for result in results if result is not None]
+        if not results:
+            return None
+        return (
+            min(last_id for last_id, _, _ in results),
+            sum(processed for _, processed, _ in results),
+            sum(filled for _, _, filled in results),
+        )
+
+    async def list_short_codes(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        pages = await asyncio.gather(
+            *(repository.list_short_codes(after_id, limit) for repository in self.repositories)
+        )
+        return list(itertools.islice(heapq.merge(*pages), limit))
+
+    async def archive_expired(self, batch_size: int) -> List[str]:
+        archived = await asyncio.gather(*(repository.archive_expired(batch_size) for repository in self.repositories))
+        return list(itertools.chain.from_iterable(archived))
+
+    async def list_expired(self, before: Optional[Tuple[datetime, int]] = None, limit: int = 50) -> List[ExpiredLink]:
+        """List expired links of every shard and merge the pages, most recently expired first"""
+        pages = await asyncio.gather(*(repository.list_expired(before, limit) for repository in self.repositories))
+        merged = heapq.merge(*pages, key=lambda link: (link.expired_at, link.id), reverse=True)
+        return list(itertools.islice(merged, limit))
+
+
+@asynccontextmanager
+async def open_link_repository(
+    session_factory: Callable[[], AsyncSession] = async_session,
+) -> AsyncIterator[LinkRepository]:
+    """Open a repository over all shards, with `session_factory` for the first one, or over the primary alone"""
+    async with session_factory() as session:
+        if len(shards) == 1:
+            yield LinkRepository(session)
+            return
+
+        async with AsyncExitStack() as stack:
+            sessions = [session] + [
+                await stack.enter_async_context(shard_session()) for shard_session in shards.sessions[1:]
+            ]
+            yield ShardedLinkRepository([LinkRepository(shard_session) for shard_session in sessions])
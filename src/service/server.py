@@ -0,0 +1,67 @@
+"""Production entry point.
+
+Usage:
+    python -m service.server [--workers N] [--host HOST] [--port PORT]
+
+Runs SERVER_WORKERS uvicorn worker processes (0 for one per available CPU), each with its own
+pools and background workers, on uvloop (where supported) and httptools. On SIGTERM a worker
+stops accepting connections, waits up to SERVER_GRACEFUL_SHUTDOWN_TIMEOUT seconds for in-flight
+requests and then runs the lifespan shutdown, which flushes buffered visits and closes the pools.
+
+Metrics are kept per process, and a /metrics scrape is answered by whichever worker accepts it,
+so with several workers successive scrapes jump between unrelated counters. The default is
+therefore one worker; scale out with more containers, each scraped on its own.
+"""
+
+import argparse
+import math
+import os
+
+import uvicorn
+
+from service.core.config import settings
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may use, honouring the container's cgroup CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m service.server")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVER_WORKERS,
+        help="0 for one per available CPU; metrics are per worker",
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "service.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers or available_cpus(),
+        loop="auto",
+        http="auto",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,328 @@
-from datetime import datetime
-from typing import Optional
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 from fastapi import Request
-from pydantic import HttpUrl
+from pydantic import HttpUrl, ValidationError
 
-from service.common.shortcode_generator import generate_short_code
-from service.core.exceptions import DuplicateAliasException, LinkNotFoundException
-from service.models.schemas.link import LinkCreate, LinkResponse, LinkSearchResponse, LinkStats, LinkUpdate
+from service.cache.code_filter import ShortCodeFilter
+from service.cache.link_cache import LinkCache
+from service.cache.single_flight import link_lookups
+from service.cache.visitor_counter import UniqueVisitorCounter
+from service.common.shortcode_generator import short_code_allocator
+from service.common.url_normalizer import split_url_prefix
+from service.core.config import settings
+from service.core.exceptions import (
+    DuplicateAliasException,
+    InvalidRequestException,
+    LinkNotEditableException,
+    LinkNotFoundException,
+    URLShortenerException,
+)
+from service.models.domain.link import Link
+from service.models.domain.visit import VisitEvent
+from service.models.schemas.link import (
+    BatchItemResult,
+    ExpiredLinkResponse,
+    ExpiredLinksResponse,
+    LinkCreate,
+    LinkResponse,
+    LinkSearchResponse,
+    LinkStats,
+    LinkTimeseries,
+    LinkUpdate,
+    VisitBucket,
+)
 from service.repositories.links import LinkRepository
+from service.workers.visit_buffer import VisitBuffer
+
+
+TIMESERIES_STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+TIMESERIES_DEFAULT_BUCKETS = {"hour": 24, "day": 30}
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _truncate(value: datetime, granularity: str) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _link_response(link: Link) -> LinkResponse:
+    """Build a response from a stored link without revalidating it"""
+    return LinkResponse.model_construct(
+        short_code=link.short_code,
+        original_url=link.original_url,
+        created_at=link.created_at,
+        expires_at=link.expires_at,
+        custom_alias=link.custom_alias,
+        redirect_type=link.redirect_type,
+    )
+
+
+def _encode_cursor(timestamp: datetime, link_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp.isoformat(), link_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, link_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(link_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidRequestException("Invalid cursor") from e
+
+
+def _duplicate_alias_result(index: int, alias: str) -> BatchItemResult:
+    return BatchItemResult(index=index, status=409, detail=f"Custom alias '{alias}' already exists")
 
 
 class LinkService:
-    def __init__(self, repository: LinkRepository):
+    def __init__(
+        self,
+        repository: LinkRepository,
+        cache: Optional[LinkCache] = None,
+        visit_buffer: Optional[VisitBuffer] = None,
+        code_filter: Optional[ShortCodeFilter] = None,
+        visitor_counter: Optional[UniqueVisitorCounter] = None,
+    ):
         self.repository = repository
+        self.cache = cache
+        self.visit_buffer = visit_buffer
+        self.code_filter = code_filter
+        self.visitor_counter = visitor_counter
+
+    async def _get_cached_link(self, short_code: str) -> Optional[Link]:
+        """Get a link through the cache, falling back to the repository on a miss.
+
+        Concurrent misses for the same short code in this worker share a single repository lookup.
+        """
+        if self.cache is not None:
+            hit, link = await self.cache.get(short_code)
+            if hit:
+                return link
+
+        return await link_lookups.do(short_code, lambda: self._load_link(short_code))
+
+    async def _load_link(self, short_code: str) -> Optional[Link]:
+        """Look a link up in the repository, unless the short code filter rules it out, and cache the result"""
+        if self.code_filter is not None and not await self.code_filter.might_contain(short_code):
+            return None
+        if self.cache is None:
+            return await self.repository.get_by_short_code(short_code)
+
+        started = time.perf_counter()
+        link = await self.repository.get_by_short_code(short_code, consistent=self.cache.recently_written(short_code))
+        if link is None:
+            await self.cache.set_missing(short_code)
+        else:
+            await self.cache.set(link, delta=time.perf_counter() - started)
+        return link
+
+    async def _invalidate(self, short_code: str) -> None:
+        if self.cache is not None:
+            await self.cache.invalidate(short_code)
+
+    async def _remember_codes(self, short_codes: Sequence[str]) -> None:
+        """Add created short codes to the filter before anyone can look them up"""
+        if self.code_filter is not None:
+            await self.code_filter.add(short_codes)
 
     async def create_link(self, link_data: LinkCreate) -> LinkResponse:
         """Create a new shortened link"""
-        if not link_data.custom_alias:
-            short_code = generate_short_code()
-        else:
+        if link_data.custom_alias:
             short_code = link_data.custom_alias
-            if await self.repository.exists_by_short_code(short_code):
+            link = await self._insert(short_code, link_data)
+            if link is None:
                 raise DuplicateAliasException(f"Custom alias '{short_code}' already exists")
+        else:
+            link = await self._find_reusable(link_data)
+            if link is not None:
+                return _link_response(link)
+            link = await self._insert_generated(link_data)
+
+        await self._remember_codes([link.short_code])
+        await self._invalidate(link.short_code)
+
+        return _link_response(link)
+
+    async def _find_reusable(self, link_data: LinkCreate) -> Optional[Link]:
+        """Find an existing generated link to return instead of creating a new one, if the client asked for it"""
+        if not link_data.reuse_existing or link_data.custom_alias:
+            return None
+        return await self.repository.find_reusable(
+            link_data.original_url.encoded_string(), link_data.expires_at, link_data.redirect_type
+        )
+
+    async def create_links_batch(self, items: Sequence[Any]) -> AsyncIterator[BatchItemResult]:
+        """Create links in chunks, yielding a result per item as soon as its chunk is committed.
+
+        Items are raw JSON documents (str/bytes) or already decoded objects. Invalid items and
+        duplicate aliases are reported individually and do not affect the rest of the batch.
+        """
+        seen_aliases = set()
+        chunk_size = settings.BATCH_CHUNK_SIZE
+        for chunk_start in range(0, len(items), chunk_size):
+            results: Dict[int, BatchItemResult] = {}
+            pending: List[Tuple[int, LinkCreate]] = []
+
+            for index, item in enumerate(items[chunk_start : chunk_start + chunk_size], start=chunk_start):
+                try:
+                    if isinstance(item, (str, bytes)):
+                        link_data = LinkCreate.model_validate_json(item)
+                    else:
+                        link_data = LinkCreate.model_validate(item)
+                except ValidationError as e:
+                    results[index] = BatchItemResult(
+                        index=index, status=422, detail=e.errors(include_url=False, include_context=False)
+                    )
+                    continue
+
+                if link_data.custom_alias:
+                    if link_data.custom_alias in seen_aliases:
+                        results[index] = _duplicate_alias_result(index, link_data.custom_alias)
+                        continue
+                    seen_aliases.add(link_data.custom_alias)
+                pending.append((index, link_data))
+
+            created = await self._insert_batch(pending)
+            if created:
+                short_codes = [link.short_code for link in created.values()]
+                await self._remember_codes(short_codes)
+                if self.cache is not None:
+                    await self.cache.invalidate_many(short_codes)
+
+            for index, link_data in pending:
+                link = created.get(index)
+                if link is None and link_data.custom_alias:
+                    results[index] = _duplicate_alias_result(index, link_data.custom_alias)
+                elif link is None:
+                    results[index] = BatchItemResult(
+                        index=index, status=500, detail="Could not allocate a free short code"
+                    )
+                else:
+                    results[index] = BatchItemResult(index=index, status=201, link=_link_response(link))
+
+            for index in sorted(results):
+                yield results[index]
+
+    async def _insert_batch(self, pending: Sequence[Tuple[int, LinkCreate]]) -> Dict[int, Link]:
+        """Insert a chunk of links with multi-row statements, returning the created links by item index.
+
+        Items asking to reuse an existing link are resolved first and get that link instead.
+        """
+        created: Dict[int, Link] = {}
+        for index, link_data in pending:
+            link = await self._find_reusable(link_data)
+            if link is not None:
+                created[index] = link
+
+        aliased = [(index, link_data) for index, link_data in pending if link_data.custom_alias]
+        generated = [
+            (index, link_data) for index, link_data in pending if not link_data.custom_alias and index not in created
+        ]
 
-        link = await self.repository.create(
+        short_codes = {index: link_data.custom_alias for index, link_data in aliased}
+        remaining = aliased
+        for _ in range(settings.SHORT_CODE_ALLOCATION_ATTEMPTS):
+            if generated:
+                codes = await short_code_allocator.allocate_many(self.repository.reserve_code_ids, len(generated))
+                short_codes.update((index, code) for (index, _), code in zip(generated, codes, strict=True))
+                remaining = remaining + generated
+            if not remaining:
+                break
+
+            links = await self.repository.create_many(
+                [
+                    (
+                        short_codes[index],
+                        link_data.original_url.encoded_string(),
+                        bool(link_data.custom_alias),
+                        link_data.expires_at,
+                        link_data.redirect_type,
+                    )
+                    for index, link_data in remaining
+                ]
+            )
+            by_code = {link.short_code: link for link in links}
+            for index, _ in remaining:
+                if short_codes[index] in by_code:
+                    created[index] = by_code[short_codes[index]]
+
+            generated = [(index, link_data) for index, link_data in generated if index not in created]
+            remaining = []
+
+        return created
+
+    async def _insert(self, short_code: str, link_data: LinkCreate) -> Optional[Link]:
+        return await self.repository.create(
             short_code=short_code,
             original_url=link_data.original_url.encoded_string(),
             custom_alias=bool(link_data.custom_alias),
             expires_at=link_data.expires_at,
+            redirect_type=link_data.redirect_type,
         )
 
-        return LinkResponse(
-            short_code=link.short_code,
-            original_url=HttpUrl(link.original_url),
-            created_at=link.created_at,
-            expires_at=link.expires_at,
-            custom_alias=link.custom_alias,
-        )
+    async def _insert_generated(self, link_data: LinkCreate) -> Link:
+        """Insert a link under a freshly allocated short code.
 
-    async def get_original_url(self, short_code: str, request: Optional[Request] = None) -> str:
-        """Get the original URL and record a visit"""
-        link = await self.repository.get_by_short_code(short_code)
+        Allocated codes never repeat, but they can still hit a custom alias or a code created
+        before the allocator existed; such codes are skipped.
+        """
+        for _ in range(settings.SHORT_CODE_ALLOCATION_ATTEMPTS):
+            short_code = await short_code_allocator.allocate(self.repository.reserve_code_ids)
+            link = await self._insert(short_code, link_data)
+            if link is not None:
+                return link
+        raise URLShortenerException("Could not allocate a free short code")
+
+    async def get_redirect_link(self, short_code: str, request: Optional[Request] = None) -> Link:
+        """Get the link to redirect to and record a visit"""
+        link = await self._get_cached_link(short_code)
         if not link:
             raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
 
-        if link.expires_at:
-            now = datetime.now(link.expires_at.tzinfo)
-            if link.expires_at < now:
-                await self.repository.delete(link.id)
-                raise LinkNotFoundException(f"Link with short code '{short_code}' has expired")
+        if link.expires_at and link.expires_at < datetime.now(link.expires_at.tzinfo):
+            raise LinkNotFoundException(f"Link with short code '{short_code}' has expired")
 
         if request:
-            user_agent = request.headers.get("user-agent", "")
-            referrer = request.headers.get("referer", "")
-            client_host = request.client.host if request.client else None
-
-            await self.repository.record_visit(
-                link_id=link.id, user_agent=user_agent, ip_address=client_host, referrer=referrer
+            visit = VisitEvent(
+                link_id=link.id,
+                visited_at=datetime.now(timezone.utc),
+                user_agent=request.headers.get("user-agent", ""),
+                ip_address=request.client.host if request.client else None,
+                referrer=request.headers.get("referer", ""),
+                short_code=link.short_code,
             )
+            if self.visit_buffer is not None:
+                await self.visit_buffer.record(visit)
+            else:
+                await self.repository.record_visits([visit])
 
-        return link.original_url
+        return link
 
     async def delete_link(self, short_code: str) -> None:
         """Delete a shortened link"""
-        link = await self.repository.get_by_short_code(short_code)
+        repository, link = await self.repository.locate(short_code, consistent=True)
         if not link:
             raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
 
-        await self.repository.delete(link.id)
+        await repository.delete(link.id)
+        await self._invalidate(short_code)
+        if self.visitor_counter is not None:
+            await self.visitor_counter.forget(link.id)
 
     async def update_link(self, short_code: str, link_data: LinkUpdate) -> LinkResponse:
         """Update a shortened link"""
-        link = await self.repository.get_by_short_code(short_code)
+        repository, link = await self.repository.locate(short_code, consistent=True)
 
         if link_data.expires_at:
             now = datetime.now(link_data.expires_at.tzinfo)
@@ -80,50 +331,178 @@ class LinkService:
 
         if not link:
             raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
+        if link.permanent:
+            raise LinkNotEditableException(
+                f"Link with short code '{short_code}' redirects permanently and cannot be changed"
+            )
 
-        updated_link = await self.repository.update(
-            link_id=link.id, original_url=link_data.original_url.encoded_string(), expires_at=link_data.expires_at
+        updated_link = await repository.update(
+            link_id=link.id,
+            original_url=link_data.original_url.encoded_string(),
+            expires_at=link_data.expires_at,
+            redirect_type=link_data.redirect_type or link.redirect_type,
         )
+        await self._invalidate(short_code)
+        if updated_link is None:
+            raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
 
-        return LinkResponse(
-            short_code=updated_link.short_code,
-            original_url=HttpUrl(updated_link.original_url),
-            created_at=updated_link.created_at,
-            expires_at=updated_link.expires_at,
-            custom_alias=updated_link.custom_alias,
-        )
+        return _link_response(updated_link)
 
     async def get_link_stats(self, short_code: str) -> LinkStats:
         """Get statistics for a shortened link"""
-        link = await self.repository.get_by_short_code(short_code)
+        repository, link = await self.repository.locate(short_code)
         if not link:
             raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
 
-        visit_count = await self.repository.get_visit_count(link.id)
-        last_visit = await self.repository.get_last_visit(link.id)
+        counters, unique_visitors = await asyncio.gather(
+            repository.get_counters(link.id), self._count_unique_visitors(link.id)
+        )
+        visit_count = counters.visit_count
+        first_visit = counters.first_visited_at
+        last_visit = counters.last_visited_at
+
+        if self.visit_buffer is not None:
+            pending_count, pending_last_visit = self.visit_buffer.pending(link.id)
+            visit_count += pending_count
+            if pending_last_visit and (last_visit is None or pending_last_visit > last_visit):
+                last_visit = pending_last_visit
 
-        return LinkStats(
+        return LinkStats.model_construct(
             short_code=link.short_code,
-            original_url=HttpUrl(link.original_url),
+            original_url=link.original_url,
             created_at=link.created_at,
             visit_count=visit_count,
+            unique_visitors=None if unique_visitors is None else min(unique_visitors, visit_count),
+            first_visited_at=first_visit,
             last_visited_at=last_visit,
         )
 
-    async def search_by_original_url(self, original_url: str) -> LinkSearchResponse:
-        """Search for links by original URL"""
-        links = await self.repository.find_by_original_url(original_url)
+    async def list_expired_links(
+        self, limit: int = settings.SEARCH_PAGE_SIZE, cursor: Optional[str] = None
+    ) -> ExpiredLinksResponse:
+        """List links removed after expiring, most recently expired first, one page at a time"""
+        links = await self.repository.list_expired(before=_decode_cursor(cursor) if cursor else None, limit=limit + 1)
 
-        return LinkSearchResponse(
-            original_url=HttpUrl(original_url),
+        return ExpiredLinksResponse.model_construct(
             links=[
-                LinkResponse(
+                ExpiredLinkResponse.model_construct(
                     short_code=link.short_code,
-                    original_url=HttpUrl(link.original_url),
+                    original_url=link.original_url,
                     created_at=link.created_at,
                     expires_at=link.expires_at,
+                    expired_at=link.expired_at,
                     custom_alias=link.custom_alias,
+                    visit_count=link.visit_count,
+                    last_visited_at=link.last_visited_at,
                 )
-                for link in links
+                for link in links[:limit]
             ],
+            next_cursor=_encode_cursor(links[limit - 1].expired_at, links[limit - 1].id)
+            if len(links) > limit
+            else None,
+        )
+
+    async def get_link_timeseries(
+        self,
+        short_code: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: str = "hour",
+    ) -> LinkTimeseries:
+        """Get visit counts of a link per hour or day; naive datetimes are treated as UTC"""
+        repository, link = await self.repository.locate(short_code)
+        if not link:
+            raise LinkNotFoundException(f"Link with short code '{short_code}' not found")
+
+        step = TIMESERIES_STEPS[granularity]
+        end = _as_utc(end) if end else datetime.now(timezone.utc)
+        if _truncate(end, granularity) < end:
+            end = _truncate(end, granularity) + step
+        if start:
+            start = _truncate(_as_utc(start), granularity)
+        else:
+            start = end - step * TIMESERIES_DEFAULT_BUCKETS[granularity]
+        if start >= end:
+            raise InvalidRequestException("Start of the range must be before its end")
+        if (end - start) / step > settings.TIMESERIES_MAX_BUCKETS:
+            raise InvalidRequestException(f"Range must not span more than {settings.TIMESERIES_MAX_BUCKETS} buckets")
+
+        bucket_starts = []
+        bucket = start
+        while bucket < end:
+            bucket_starts.append(bucket)
+            bucket += step
+
+        series, unique_visitors = await asyncio.gather(
+            repository.get_visit_timeseries(link.id, start, end, granularity),
+            self._count_bucket_unique_visitors(link.id, bucket_starts, granularity),
+        )
+        counts = dict(series)
+        buckets = []
+        for index, bucket in enumerate(bucket_starts):
+            visit_count = counts.get(bucket, 0)
+            buckets.append(
+                VisitBucket.model_construct(
+                    bucket=bucket,
+                    visit_count=visit_count,
+                    unique_visitors=None if unique_visitors is None else min(unique_visitors[index], visit_count),
+                )
+            )
+
+        return LinkTimeseries.model_construct(
+            short_code=link.short_code, granularity=granularity, start=start, end=end, buckets=buckets
+        )
+
+    async def _count_unique_visitors(self, link_id: int) -> Optional[int]:
+        if self.visitor_counter is None:
+            return None
+        return await self.visitor_counter.count(link_id)
+
+    async def _count_bucket_unique_visitors(
+        self, link_id: int, buckets: Sequence[datetime], granularity: str
+    ) -> Optional[List[int]]:
+        if self.visitor_counter is None:
+            return None
+        return await self.visitor_counter.count_buckets(link_id, buckets, granularity)
+
+    async def search_links(
+        self,
+        original_url: Optional[HttpUrl] = None,
+        domain: Optional[str] = None,
+        prefix: Optional[str] = None,
+        limit: int = settings.SEARCH_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> LinkSearchResponse:
+        """Search for links by original URL, domain and/or URL prefix, one page at a time"""
+        if original_url is None and not domain and not prefix:
+            raise InvalidRequestException("One of original_url, domain or prefix is required")
+
+        host = domain.strip().lower() if domain else None
+        if prefix:
+            prefix, prefix_host = split_url_prefix(prefix)
+            if not prefix.startswith(("http://", "https://")):
+                raise InvalidRequestException("Prefix must start with http:// or https://")
+            if prefix_host is not None:
+                if host is not None and host != prefix_host:
+                    return LinkSearchResponse.model_construct(
+                        original_url=original_url, domain=domain, prefix=prefix, links=[], next_cursor=None
+                    )
+                host = prefix_host
+
+        links = await self.repository.search(
+            original_url=original_url.encoded_string() if original_url is not None else None,
+            host=host,
+            prefix=prefix,
+            before=_decode_cursor(cursor) if cursor else None,
+            limit=limit + 1,
+        )
+
+        return LinkSearchResponse.model_construct(
+            original_url=original_url,
+            domain=domain,
+            prefix=prefix,
+            links=[_link_response(link) for link in links[:limit]],
+            next_cursor=_encode_cursor(links[limit - 1].created_at, links[limit - 1].id)
+            if len(links) > limit
+            else None,
         )
@@ -0,0 +1,34 @@
+"""Maintenance commands for the per-link visit counters.
+
+Usage:
+    python -m service.tools.counters rebuild [--link-id ID]
+"""
+
+import argparse
+import asyncio
+
+from service.db.postgres import dispose_engines
+from service.repositories.links import open_link_repository
+
+
+async def rebuild(link_id: int = None) -> None:
+    async with open_link_repository() as repository:
+        rebuilt = await repository.rebuild_counters(link_id)
+    await dispose_engines()
+    print(f"Rebuilt counters for {rebuilt} link(s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m service.tools.counters")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = commands.add_parser("rebuild", help="recompute counters from link_visits_hourly")
+    rebuild_parser.add_argument("--link-id", type=int, default=None, help="only rebuild counters of this link")
+
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        asyncio.run(rebuild(args.link_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""Bulk import and export of the links table.
+
+Usage:
+    python -m service.tools.links rehash [--checkpoint FILE]
+    python -m service.tools.links export [--output FILE] [--format ndjson|csv] [--checkpoint FILE]
+    python -m service.tools.links import [--input FILE] [--format ndjson|csv] [--checkpoint FILE]
+                                         [--on-conflict skip|overwrite|fail]
+
+Records carry the fields of the Link model (id is ignored on import). Records without a
+short_code get a generated one; records with one are validated like a custom alias. Import
+goes through COPY into a temporary table and export reads through a server-side cursor, so
+memory use does not depend on the table size. With shards configured, export reads every
+shard in turn and import writes each link to the shard its short code belongs to. Both
+commands store their progress in the checkpoint file after every batch and resume from it
+when restarted; an import batch that was interrupted around its commit is replayed with the
+same generated short codes, so it does not create links twice. With `--on-conflict fail` a
+short code repeated in the input stops the import too. `rehash` fills in the normalized URL
+digests of links created before the digest column existed.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, fields
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+import asyncpg
+from pydantic import ValidationError
+
+from service.cache.code_filter import short_code_filter
+from service.cache.link_cache import LinkCache
+from service.common.shortcode_generator import ShortCodeAllocator
+from service.common.url_normalizer import url_digest, url_host
+from service.core.config import settings
+from service.db.asyncpg_pool import asyncpg_dsn
+from service.db.postgres import dispose_engines, shards
+from service.db.redis import redis_client
+from service.models.domain.link import DEFAULT_REDIRECT_TYPE, Link
+from service.models.schemas.link import LinkCreate
+from service.repositories.links import open_link_repository
+
+
+FIELDS = [field.name for field in fields(Link)]
+IMPORT_COLUMNS = [
+    "short_code",
+    "original_url",
+    "original_url_hash",
+    "host",
+    "custom_alias",
+    "created_at",
+    "expires_at",
+    "redirect_type",
+]
+
+CONFLICT_CLAUSES = {
+    "skip": "ON CONFLICT (short_code) DO NOTHING",
+    "overwrite": """
+        ON CONFLICT (short_code) DO UPDATE
+        SET original_url = EXCLUDED.original_url,
+            original_url_hash = EXCLUDED.original_url_hash,
+            host = EXCLUDED.host,
+            custom_alias = EXCLUDED.custom_alias,
+            expires_at = EXCLUDED.expires_at,
+            redirect_type = EXCLUDED.redirect_type
+    """,
+    "fail": "",
+}
+
+
+async def connect_shards() -> List[asyncpg.Connection]:
+    """Open a connection to every shard, in shard order"""
+    return [await asyncpg.connect(asyncpg_dsn(url)) for url in shards.urls]
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_checkpoint(path: Optional[str], state: Dict[str, Any]) -> None:
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    def __init__(self, action: str):
+        self.action = action
+        self.started = time.monotonic()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, **counts: int) -> None:
+        for name, count in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    def report(self) -> None:
+        elapsed = time.monotonic() - self.started
+        total = self.counts.get("processed", 0)
+        summary = ", ".join(f"{name}={count}" for name, count in self.counts.items())
+        print(f"{self.action}: {summary} ({total / max(elapsed, 1e-9):.0f} rows/s)", file=sys.stderr)
+
+
+def read_records(source: TextIO, fmt: str) -> Iterator[Union[Dict[str, Any], str]]:
+    if fmt == "csv":
+        for row in csv.DictReader(source):
+            yield {key: (value if value != "" else None) for key, value in row.items()}
+    else:
+        for line in source:
+            if line.strip():
+                yield line
+
+
+def parse_record(
+    record: Union[Dict[str, Any], str],
+) -> Tuple[Optional[str], str, bytes, str, bool, Optional[datetime], Optional[datetime], int]:
+    """Validate a record with the LinkCreate rules and turn it into an import row"""
+    if isinstance(record, str):
+        record = json.loads(record)
+    short_code = record.get("short_code")
+    redirect_type = record.get("redirect_type")
+    if isinstance(redirect_type, str):
+        redirect_type = int(redirect_type)
+    link_data = LinkCreate.model_validate(
+        {
+            "original_url": record.get("original_url"),
+            "custom_alias": short_code,
+            "expires_at": record.get("expires_at"),
+            "redirect_type": redirect_type if redirect_type is not None else DEFAULT_REDIRECT_TYPE,
+        }
+    )
+    custom_alias = record.get("custom_alias")
+    if isinstance(custom_alias, str):
+        custom_alias = custom_alias.lower() in ("1", "true", "t", "yes")
+    created_at = record.get("created_at")
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+
+    original_url = link_data.original_url.encoded_string()
+    return (
+        link_data.custom_alias,
+        original_url,
+        url_digest(original_url),
+        url_host(original_url),
+        bool(custom_alias) if short_code else False,
+        created_at,
+        link_data.expires_at,
+        link_data.redirect_type,
+    )
+
+
+async def import_links(args: argparse.Namespace) -> None:
+    checkpoint = load_checkpoint(args.checkpoint)
+    skip_records = checkpoint.get("records", 0)
+    # A batch that may have been committed before the previous run stopped is replayed with the
+    # same generated codes, so that it cannot create the same links twice
+    pending = checkpoint.get("pending", {"records": 0, "short_codes": {}})
+    progress = Progress("import")
+    allocator = ShortCodeAllocator(block_size=args.batch_size)
+    cache = LinkCache(redis_client) if settings.LINK_CACHE_ENABLED else None
+
+    connections = await connect_shards()
+    create_table_query = """
+        CREATE TEMPORARY TABLE links_import (
+            short_code        VARCHAR(16),
+            original_url      TEXT,
+            original_url_hash BYTEA,
+            host              TEXT,
+            custom_alias      BOOLEAN,
+            created_at        TIMESTAMP WITH TIME ZONE,
+            expires_at        TIMESTAMP WITH TIME ZONE,
+            redirect_type     SMALLINT
+        ) ON COMMIT DELETE ROWS
+    """
+    for conn in connections:
+        await conn.execute(create_table_query)
+    insert_query = """
+        INSERT INTO links (
+            short_code, original_url, original_url_hash, host, custom_alias, created_at, expires_at, redirect_type
+        )
+        SELECT short_code, original_url, original_url_hash, host, custom_alias, COALESCE(created_at, NOW()), expires_at,
+               redirect_type
+        FROM links_import i
+    """
+    # Rows of a replayed batch that were already imported would stop the import with `fail`
+    replay_query = f"""
+        {insert_query}
+        WHERE NOT EXISTS (
+            SELECT 1 FROM links l
+            WHERE l.short_code = i.short_code AND l.original_url_hash IS NOT DISTINCT FROM i.original_url_hash
+        )
+        {CONFLICT_CLAUSES[args.on_conflict]}
+    """
+    insert_query += CONFLICT_CLAUSES[args.on_conflict]
+
+    async def reserve(count: int) -> List[int]:
+        rows = await connections[0].fetch("SELECT nextval('short_code_id_seq') FROM generate_series(1, $1)", count)
+        return [row[0] for row in rows]
+
+    async def flush(batch: List[tuple], committed: int, records: int, generated: Dict[str, str]) -> None:
+        unique: Dict[str, tuple] = {}
+        for row in batch:
+            if row[0] not in unique or args.on_conflict == "overwrite":
+                unique[row[0]] = row
+            elif args.on_conflict == "fail":
+                print(
+                    f"import stopped on short code {row[0]} repeated in the input, "
+                    "fix it and resume from the checkpoint",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+        by_shard: Dict[int, List[tuple]] = {}
+        for row in unique.values():
+            by_shard.setdefault(shards.shard_of(row[0]), []).append(row)
+
+        save_checkpoint(
+            args.checkpoint, {"records": committed, "pending": {"records": records, "short_codes": generated}}
+        )
+        replay = committed < pending["records"] and args.on_conflict == "fail"
+        query = replay_query if replay else insert_query
+        inserted = 0
+        for shard, shard_batch in by_shard.items():
+            conn = connections[shard]
+            async with conn.transaction():
+                await conn.copy_records_to_table("links_import", records=shard_batch, columns=IMPORT_COLUMNS)
+                status = await conn.execute(query)
+            inserted += int(status.rsplit(" ", 1)[-1])
+        short_codes = list(unique)
+        if short_code_filter is not None:
+            await short_code_filter.add(short_codes)
+        if cache is not None:
+            await cache.invalidate_many(short_codes)
+        save_checkpoint(args.checkpoint, {"records": records})
+        progress.add(processed=len(unique), written=inserted, conflicts=len(unique) - inserted)
+        progress.report()
+
+    source = open(args.input) if args.input != "-" else sys.stdin
+    try:
+        batch: List[tuple] = []
+        generated: Dict[str, str] = {}
+        committed = records = skip_records
+        for line_number, record in enumerate(read_records(source, args.format), start=1):
+            if line_number <= skip_records:
+                continue
+            records = line_number
+            try:
+                short_code, *row = parse_record(record)
+            except (ValidationError, ValueError, TypeError, AttributeError) as e:
+                print(f"record {line_number}: rejected: {e}", file=sys.stderr)
+                progress.add(rejected=1)
+                continue
+            if short_code is None:
+                short_code = pending["short_codes"].get(str(line_number)) or await allocator.allocate(reserve)
+                generated[str(line_number)] = short_code
+            batch.append((short_code, *row))
+
+            if len(batch) >= args.batch_size:
+                await flush(batch, committed, records, generated)
+                committed = records
+                batch, generated = [], {}
+        if batch:
+            await flush(batch, committed, records, generated)
+        save_checkpoint(args.checkpoint, {"records": records})
+    except asyncpg.UniqueViolationError as e:
+        print(f"import stopped on an existing short code, resume from the checkpoint: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        for conn in connections:
+            await conn.close()
+        await redis_client.aclose()
+    progress.report()
+
+
+def format_link(link: Link, fmt: str, writer: Optional[csv.DictWriter], output: TextIO) -> None:
+    data = asdict(link)
+    for key in ("created_at", "expires_at"):
+        if data[key] is not None:
+            data[key] = data[key].isoformat()
+    if writer is not None:
+        writer.writerow(data)
+    else:
+        output.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+
+async def export_links(args: argparse.Namespace) -> None:
+    checkpoint = load_checkpoint(args.checkpoint)
+    progress = Progress("export")
+
+    resuming = bool(checkpoint) and args.output != "-"
+    output = open(args.output, "a" if resuming else "w", newline="") if args.output != "-" else sys.stdout
+    writer = csv.DictWriter(output, fieldnames=FIELDS) if args.format == "csv" else None
+    if writer is not None and not resuming:
+        writer.writeheader()
+
+    connections = await connect_shards()
+    try:
+        query = """
+            SELECT id, short_code, original_url, custom_alias, created_at, expires_at, redirect_type
+            FROM links
+            WHERE id > $1
+            ORDER BY id
+        """
+        for index, conn in enumerate(connections):
+            last_id = checkpoint.get(str(index), 0)
+            async with conn.transaction(readonly=True):
+                exported = 0
+                async for record in conn.cursor(query, last_id, prefetch=args.batch_size):
+                    format_link(Link(**dict(record)), args.format, writer, output)
+                    last_id = record["id"]
+                    exported += 1
+                    if exported % args.batch_size == 0:
+                        output.flush()
+                        checkpoint[str(index)] = last_id
+                        save_checkpoint(args.checkpoint, checkpoint)
+                        progress.add(processed=args.batch_size)
+                        progress.report()
+            output.flush()
+            checkpoint[str(index)] = last_id
+            save_checkpoint(args.checkpoint, checkpoint)
+            progress.add(processed=exported % args.batch_size)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        for conn in connections:
+            await conn.close()
+    progress.report()
+
+
+async def rehash_links(args: argparse.Namespace) -> None:
+    checkpoint = load_checkpoint(args.checkpoint)
+    last_id = checkpoint.get("last_id", 0)
+    progress = Progress("rehash")
+
+    try:
+        while True:
+            async with open_link_repository() as repository:
+                batch = await repository.backfill_url_hashes(last_id, args.batch_size)
+            if batch is None:
+                break
+            last_id, processed, filled = batch
+            save_checkpoint(args.checkpoint, {"last_id": last_id})
+            progress.add(processed=processed, filled=filled)
+            progress.report()
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m service.tools.links")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="stream all links to a file")
+    export_parser.add_argument("--output", default="-", help="output file, stdout by default")
+
+    import_parser = commands.add_parser("import", help="load links from a file")
+    import_parser.add_argument("--input", default="-", help="input file, stdin by default")
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=sorted(CONFLICT_CLAUSES),
+        default="skip",
+        help="what to do with records whose short code already exists",
+    )
+
+    rehash_parser = commands.add_parser("rehash", help="fill in missing original URL digests")
+
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    for command_parser in (export_parser, import_parser, rehash_parser):
+        command_parser.add_argument("--checkpoint", default=None, help="file to store and resume progress from")
+        command_parser.add_argument("--batch-size", type=int, default=10000)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        asyncio.run(export_links(args))
+    elif args.command == "import":
+        asyncio.run(import_links(args))
+    else:
+        asyncio.run(rehash_links(args))
+
+
+if __name__ == "__main__":
+    main()
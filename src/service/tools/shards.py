@@ -0,0 +1,204 @@
+"""Setup and rebalancing of links sharded over several databases.
+
+Usage:
+    python -m service.tools.shards init
+    python -m service.tools.shards rebalance [--batch-size N] [--checkpoint FILE]
+
+Shards are DATABASE_URL followed by DATABASE_SHARD_URLS, each migrated like the primary.
+`init` makes link IDs unique across shards: every shard's links_id_seq steps by the number of
+shards from its own offset, above the highest ID already used anywhere. Run it after adding
+shards; it restarts every sequence with the new step.
+
+`rebalance` moves every link to the shard its slot belongs to under the current SHARD_MAP,
+along with its counters, hourly rollups and raw visits. Run it with the new map deployed and
+SHARD_REBALANCING=true, under which the service finds links that were not moved yet and writes
+visits to every shard; turn the flag off once it is done. Links are moved in batches, each
+committed on the target before it is deleted from the source, so the tool can be stopped and
+resumed at any time. Visits recorded in the moment a batch is copied may be missed. A link
+whose short code was meanwhile taken on its target shard is left in place and reported.
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import timezone
+from typing import Dict, List
+
+import asyncpg
+
+from service.common.shortcode_generator import SLOTS
+from service.db.postgres import shards
+from service.tools.links import Progress, connect_shards, load_checkpoint, save_checkpoint
+
+
+LINK_COLUMNS = [
+    "id",
+    "short_code",
+    "original_url",
+    "original_url_hash",
+    "host",
+    "custom_alias",
+    "created_at",
+    "expires_at",
+    "redirect_type",
+]
+LINK_TYPES = ["BIGINT", "VARCHAR(16)", "TEXT", "BYTEA", "TEXT", "BOOLEAN", "TIMESTAMPTZ", "TIMESTAMPTZ", "SMALLINT"]
+COUNTER_COLUMNS = ["link_id", "visit_count", "first_visited_at", "last_visited_at"]
+COUNTER_TYPES = ["BIGINT", "BIGINT", "TIMESTAMPTZ", "TIMESTAMPTZ"]
+ROLLUP_COLUMNS = ["link_id", "bucket", "visit_count", "first_visited_at", "last_visited_at"]
+ROLLUP_TYPES = ["BIGINT", "TIMESTAMPTZ", "BIGINT", "TIMESTAMPTZ", "TIMESTAMPTZ"]
+VISIT_COLUMNS = ["link_id", "visited_at", "user_agent", "ip_address", "referrer"]
+
+
+def unnest_insert(table: str, columns: List[str], types: List[str], suffix: str = "") -> str:
+    arrays = ", ".join(f"CAST(${index} AS {type_}[])" for index, type_ in enumerate(types, start=1))
+    return f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM unnest({arrays}) {suffix}"
+
+
+def as_arrays(records: List[asyncpg.Record], columns: List[str]) -> List[list]:
+    return [[record[column] for record in records] for column in columns]
+
+
+async def init_shards() -> None:
+    if len(shards) > SLOTS:
+        sys.exit(f"At most {SLOTS} shards are supported")
+
+    stride = len(shards)
+    connections = await connect_shards()
+    try:
+        increments = [
+            await conn.fetchval("SELECT increment_by FROM pg_sequences WHERE sequencename = 'links_id_seq'")
+            for conn in connections
+        ]
+        if all(increment == stride for increment in increments):
+            print(f"all {stride} shards are already initialized", file=sys.stderr)
+            return
+
+        highest = 0
+        for conn in connections:
+            highest = max(
+                highest,
+                await conn.fetchval("""
+                    SELECT GREATEST(
+                        (SELECT last_value FROM links_id_seq),
+                        (SELECT COALESCE(MAX(id), 0) FROM links),
+                        (SELECT COALESCE(MAX(id), 0) FROM expired_links)
+                    )
+                """),
+            )
+
+        for index, conn in enumerate(connections):
+            start = highest + 1 + (index - highest - 1) % stride
+            await conn.execute(f"ALTER SEQUENCE links_id_seq INCREMENT BY {stride} RESTART WITH {start}")
+            print(f"shard {index}: link IDs continue from {start} in steps of {stride}", file=sys.stderr)
+    finally:
+        for conn in connections:
+            await conn.close()
+
+
+async def move_links(source: asyncpg.Connection, target: asyncpg.Connection, ids: List[int]) -> int:
+    """Copy links with their visit data to `target` and delete them from `source`, returning how many moved"""
+    async with source.transaction():
+        links = await source.fetch(
+            f"SELECT {', '.join(LINK_COLUMNS)} FROM links WHERE id = ANY($1::BIGINT[]) FOR NO KEY UPDATE", ids
+        )
+        async with target.transaction():
+            inserted = await target.fetch(
+                unnest_insert("links", LINK_COLUMNS, LINK_TYPES, "ON CONFLICT DO NOTHING RETURNING id"),
+                *as_arrays(links, LINK_COLUMNS),
+            )
+            inserted_ids = [row["id"] for row in inserted]
+            if inserted_ids:
+                counters = await source.fetch(
+                    f"SELECT {', '.join(COUNTER_COLUMNS)} FROM link_counters WHERE link_id = ANY($1::BIGINT[])",
+                    inserted_ids,
+                )
+                rollups = await source.fetch(
+                    f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM link_visits_hourly WHERE link_id = ANY($1::BIGINT[])",
+                    inserted_ids,
+                )
+                visits = await source.fetch(
+                    f"SELECT {', '.join(VISIT_COLUMNS)} FROM link_visits WHERE link_id = ANY($1::BIGINT[])",
+                    inserted_ids,
+                )
+                await target.execute(
+                    unnest_insert("link_counters", COUNTER_COLUMNS, COUNTER_TYPES),
+                    *as_arrays(counters, COUNTER_COLUMNS),
+                )
+                await target.execute(
+                    unnest_insert("link_visits_hourly", ROLLUP_COLUMNS, ROLLUP_TYPES),
+                    *as_arrays(rollups, ROLLUP_COLUMNS),
+                )
+                if visits:
+                    days = [visit["visited_at"].astimezone(timezone.utc).date() for visit in visits]
+                    await target.execute(
+                        "SELECT create_link_visits_partitions($1, $2)", min(days), (max(days) - min(days)).days + 1
+                    )
+                    await target.copy_records_to_table(
+                        "link_visits", records=[tuple(visit) for visit in visits], columns=VISIT_COLUMNS
+                    )
+            moved = await target.fetch("SELECT id FROM links WHERE id = ANY($1::BIGINT[])", ids)
+
+        moved_ids = {row["id"] for row in moved}
+        await source.execute("DELETE FROM links WHERE id = ANY($1::BIGINT[])", list(moved_ids))
+
+    for link in links:
+        if link["id"] not in moved_ids:
+            print(f"link {link['short_code']}: short code is taken on the target shard, left in place", file=sys.stderr)
+    return len(moved_ids)
+
+
+async def rebalance(args: argparse.Namespace) -> None:
+    checkpoint = load_checkpoint(args.checkpoint)
+    progress = Progress("rebalance")
+
+    connections = await connect_shards()
+    try:
+        for index, source in enumerate(connections):
+            last_id = checkpoint.get(str(index), 0)
+            while True:
+                rows = await source.fetch(
+                    "SELECT id, short_code FROM links WHERE id > $1 ORDER BY id LIMIT $2", last_id, args.batch_size
+                )
+                if not rows:
+                    break
+
+                misplaced: Dict[int, List[int]] = {}
+                for row in rows:
+                    shard = shards.shard_of(row["short_code"])
+                    if shard != index:
+                        misplaced.setdefault(shard, []).append(row["id"])
+                moved = 0
+                for shard, ids in misplaced.items():
+                    moved += await move_links(source, connections[shard], ids)
+
+                last_id = rows[-1]["id"]
+                checkpoint[str(index)] = last_id
+                save_checkpoint(args.checkpoint, checkpoint)
+                progress.add(processed=len(rows), moved=moved)
+                progress.report()
+    finally:
+        for conn in connections:
+            await conn.close()
+    progress.report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m service.tools.shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init", help="make link IDs unique across shards")
+
+    rebalance_parser = commands.add_parser("rebalance", help="move links to the shards their slots belong to")
+    rebalance_parser.add_argument("--checkpoint", default=None, help="file to store and resume progress from")
+    rebalance_parser.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == "init":
+        asyncio.run(init_shards())
+    else:
+        asyncio.run(rebalance(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+from service.cache.code_filter import ShortCodeFilter
+from service.core.config import settings
+from service.repositories.links import open_link_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShortCodeFilterMaintenance:
+    """Keeps the short code filter in shape.
+
+    Every `refresh_interval` seconds it refreshes the filter stats for /metrics. Once the filter
+    is missing, stale or older than `interval` seconds, one worker of the deployment rebuilds
+    it from the links table, reading `batch_size` codes at a time.
+    """
+
+    def __init__(
+        self,
+        code_filter: ShortCodeFilter,
+        interval: float = settings.SHORT_CODE_FILTER_REBUILD_INTERVAL,
+        refresh_interval: float = settings.SHORT_CODE_FILTER_REFRESH_INTERVAL,
+        batch_size: int = settings.SHORT_CODE_FILTER_BATCH_SIZE,
+    ):
+        self.code_filter = code_filter
+        self.interval = interval
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _short_code_batches(self) -> AsyncIterator[List[str]]:
+        last_id = 0
+        while True:
+            async with open_link_repository() as repository:
+                rows = await repository.list_short_codes(last_id, self.batch_size)
+            if not rows:
+                return
+            yield [short_code for _, short_code in rows]
+            last_id = rows[-1][0]
+
+    async def run_once(self) -> None:
+        await self.code_filter.refresh_meta()
+        if not self.code_filter.rebuild_due(self.interval):
+            return
+        token = await self.code_filter.acquire_rebuild()
+        if token is None:
+            return
+
+        started = time.monotonic()
+        count = await self.code_filter.rebuild(self._short_code_batches(), token)
+        if count is None:
+            logger.warning(
+                "Short code filter rebuild outlived its %ds claim and was discarded", self.code_filter.build_timeout
+            )
+            return
+        logger.info("Rebuilt the short code filter with %d codes in %.2fs", count, time.monotonic() - started)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Short code filter maintenance failed")
+            await asyncio.sleep(self.refresh_interval)
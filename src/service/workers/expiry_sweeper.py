@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.cache.link_cache import LinkCache
+from service.core.config import settings
+from service.db.postgres import async_session
+from service.repositories.links import open_link_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """Periodically moves expired links into the expired_links archive and evicts them from the cache.
+
+    Each run deletes links in batches of `batch_size`, one transaction per batch, until a batch
+    comes back short.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        cache: Optional[LinkCache] = None,
+        interval: float = settings.EXPIRY_SWEEP_INTERVAL,
+        batch_size: int = settings.EXPIRY_SWEEP_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        swept = 0
+        while True:
+            async with open_link_repository(self.session_factory) as repository:
+                short_codes = await repository.archive_expired(self.batch_size)
+            if self.cache is not None and short_codes:
+                await self.cache.invalidate_many(short_codes)
+            swept += len(short_codes)
+            if len(short_codes) < self.batch_size:
+                break
+        if swept:
+            logger.info("Archived %d expired links", swept)
+        return swept
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Expired link sweep failed")
+            await asyncio.sleep(self.interval)
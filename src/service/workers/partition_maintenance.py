@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.core.config import settings
+from service.db.postgres import async_session
+from service.repositories.links import open_link_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintenance:
+    """Periodically creates upcoming link_visits partitions and drops the expired ones"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        interval: float = settings.VISIT_PARTITION_MAINTENANCE_INTERVAL,
+        days_ahead: int = settings.VISIT_PARTITIONS_AHEAD_DAYS,
+        retention_days: int = settings.VISIT_RETENTION_DAYS,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> None:
+        async with open_link_repository(self.session_factory) as repository:
+            created = await repository.create_visit_partitions(self.days_ahead)
+            dropped = await repository.drop_visit_partitions(self.retention_days)
+        if created or dropped:
+            logger.info("Created %d and dropped %d link_visits partitions", created, dropped)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("link_visits partition maintenance failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from typing import Optional
+
+from service.core.config import settings
+from service.db.postgres import ReplicaSet, replicas
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaLagMonitor:
+    """Periodically measures replica lag so that lagging replicas stop receiving reads"""
+
+    def __init__(self, replica_set: ReplicaSet = replicas, interval: float = settings.REPLICA_LAG_CHECK_INTERVAL):
+        self.replica_set = replica_set
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.replica_set.check_lag()
+            except Exception:
+                logger.exception("Replica lag check failed")
+            await asyncio.sleep(self.interval)
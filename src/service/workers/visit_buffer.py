@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.cache.visitor_counter import UniqueVisitorCounter, unique_visitors
+from service.core.config import settings
+from service.db.postgres import async_session
+from service.models.domain.visit import VisitEvent
+from service.repositories.links import UnrecordedVisitsError, open_link_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+class VisitBuffer:
+    """Bounded in-process queue of visits drained in batches by a background flusher.
+
+    Redirects only enqueue an event; the flusher writes up to `batch_size` visits per
+    statement, waiting at most `flush_interval` seconds for a batch to fill up. When the
+    queue is full new visits are either dropped or make the caller wait, depending on
+    `overflow`. A batch that fails to write is retried up to `retries` times, waiting
+    `retry_delay` seconds before the first retry and twice as long before each next one, and
+    only then dropped; meanwhile new visits keep queueing. Visits that are queued but not yet
+    written are tracked per link so that statistics served by this worker stay up to date.
+    Written batches also feed the unique visitor estimates of `visitor_counter`.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        maxsize: int = settings.VISIT_BUFFER_MAXSIZE,
+        batch_size: int = settings.VISIT_BATCH_SIZE,
+        flush_interval: float = settings.VISIT_FLUSH_INTERVAL,
+        overflow: str = settings.VISIT_BUFFER_OVERFLOW,
+        retries: int = settings.VISIT_FLUSH_RETRIES,
+        retry_delay: float = settings.VISIT_FLUSH_RETRY_DELAY,
+        visitor_counter: Optional[UniqueVisitorCounter] = None,
+    ):
+        self.session_factory = session_factory
+        self.visitor_counter = visitor_counter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._queue: "asyncio.Queue[VisitEvent]" = asyncio.Queue(maxsize)
+        self._batch: List[VisitEvent] = []
+        self._pending: Dict[int, Tuple[int, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + len(self._batch)
+
+    async def record(self, visit: VisitEvent) -> None:
+        """Queue a visit for the next batch"""
+        try:
+            self._queue.put_nowait(visit)
+        except asyncio.QueueFull:
+            if self.overflow != "block":
+                self.dropped += 1
+                return
+            await self._queue.put(visit)
+
+        count, last_visited_at = self._pending.get(visit.link_id, (0, visit.visited_at))
+        self._pending[visit.link_id] = (count + 1, max(last_visited_at, visit.visited_at))
+
+    def pending(self, link_id: int) -> Tuple[int, Optional[datetime]]:
+        """Get the number of queued visits for a link and the latest of their timestamps"""
+        return self._pending.get(link_id, (0, None))
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything that is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._inflight is not None:
+            await self._inflight
+
+        while True:
+            self._fill_batch()
+            if not self._batch:
+                break
+            await self._flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+
+            while len(self._batch) < self.batch_size:
+                self._fill_batch()
+                remaining = deadline - loop.time()
+                if len(self._batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except TimeoutError:
+                    break
+
+            self._inflight = asyncio.ensure_future(self._flush())
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    def _fill_batch(self) -> None:
+        while len(self._batch) < self.batch_size:
+            try:
+                self._batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def _flush(self) -> None:
+        batch, self._batch = self._batch, []
+        unwritten = batch
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                async with open_link_repository(self.session_factory) as repository:
+                    await repository.record_visits(unwritten)
+            except UnrecordedVisitsError as e:
+                unrecorded = {id(visit) for visit in e.visits}
+                await self._written([visit for visit in unwritten if id(visit) not in unrecorded])
+                unwritten = e.visits
+                error = e.__cause__ or e
+            except Exception as e:
+                error = e
+            else:
+                await self._written(unwritten)
+                return
+
+            if attempt < self.retries:
+                logger.warning(
+                    "Failed to write %d buffered visits, retrying in %.1fs: %s", len(unwritten), delay, error
+                )
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        logger.error("Dropping %d buffered visits after %d attempts", len(unwritten), self.retries + 1, exc_info=error)
+        self.failed += len(unwritten)
+        self._forget(unwritten)
+
+    async def _written(self, batch: List[VisitEvent]) -> None:
+        self._forget(batch)
+        self.written += len(batch)
+
+        if self.visitor_counter is not None and batch:
+            try:
+                await self.visitor_counter.add(batch)
+            except Exception:
+                logger.exception("Failed to count unique visitors of %d visits", len(batch))
+
+    def _forget(self, batch: List[VisitEvent]) -> None:
+        for visit in batch:
+            count, last_visited_at = self._pending.get(visit.link_id, (1, visit.visited_at))
+            if count <= 1:
+                self._pending.pop(visit.link_id, None)
+            else:
+                self._pending[visit.link_id] = (count - 1, last_visited_at)
+
+
+visit_buffer = VisitBuffer(visitor_counter=unique_visitors)
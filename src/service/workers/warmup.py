@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Optional, Union
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from service.cache.link_cache import LinkCache, local_link_cache
+from service.core.config import settings
+from service.db.asyncpg_pool import asyncpg_pools
+from service.db.postgres import replicas, shards
+from service.db.redis import redis_client
+from service.repositories.links import AsyncpgLinkRepository, LinkRepository, open_link_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_hot_queries(repository: Union[LinkRepository, AsyncpgLinkRepository]) -> None:
+    """Run the redirect and stats lookups once, so the connection has their statements prepared"""
+    await repository.get_by_short_code("", consistent=True)
+    await repository.get_counters(0)
+
+
+async def _prepare_connection(connection: AsyncConnection) -> None:
+    async with AsyncSession(bind=connection) as session:
+        await _run_hot_queries(LinkRepository(session))
+
+
+async def _warm_engine(pool_engine: AsyncEngine, connections: int) -> None:
+    """Open `connections` pooled connections at once and prepare the hot statements on each"""
+    async with AsyncExitStack() as stack:
+        opened = await asyncio.gather(*(stack.enter_async_context(pool_engine.connect()) for _ in range(connections)))
+        await asyncio.gather(*(_prepare_connection(connection) for connection in opened))
+
+
+async def _warm_asyncpg_pool(pool: asyncpg.Pool) -> None:
+    """Prepare the hot statements on every connection the pool keeps open"""
+    async with AsyncExitStack() as stack:
+        opened = await asyncio.gather(*(stack.enter_async_context(pool.acquire()) for _ in range(pool.get_min_size())))
+        await asyncio.gather(*(_run_hot_queries(AsyncpgLinkRepository(None, pool=connection)) for connection in opened))
+
+
+class StartupWarmup:
+    """Warms a freshly started worker up before it is reported ready.
+
+    Opens `pool_connections` connections in every pool, prepares the redirect and stats
+    statements on them, and primes the link cache with the `cache_links` most visited live
+    links. It runs in the background, so the server already accepts connections and answers
+    /ready with 503 meanwhile. Warm-up is best effort: on failure or after `timeout` seconds
+    the worker is reported ready anyway, since it can still serve traffic cold.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[LinkCache] = None,
+        enabled: bool = settings.WARMUP_ENABLED,
+        pool_connections: int = settings.DB_POOL_SIZE,
+        cache_links: int = settings.WARMUP_CACHE_LINKS,
+        timeout: float = settings.WARMUP_TIMEOUT,
+    ):
+        self.cache = cache
+        self.enabled = enabled
+        self.pool_connections = pool_connections
+        self.cache_links = cache_links
+        self.timeout = timeout
+        self.ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm_pools(self) -> None:
+        await asyncio.gather(
+            *(_warm_engine(pool_engine, self.pool_connections) for pool_engine in [*shards.engines, *replicas.engines]),
+            *(_warm_asyncpg_pool(pool) for _, pool in asyncpg_pools.named_pools()),
+        )
+
+    async def prime_cache(self) -> int:
+        if self.cache is None or self.cache_links <= 0:
+            return 0
+        async with open_link_repository() as repository:
+            links = await repository.get_most_visited(self.cache_links)
+        await self.cache.prime(links)
+        return len(links)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            self.ready.set()
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self.warm_pools()
+                primed = await self.prime_cache()
+            logger.info("Warm-up finished in %.2fs, %d links cached", time.monotonic() - started, primed)
+        except TimeoutError:
+            logger.warning("Warm-up did not finish in %.0fs", self.timeout)
+        except Exception:
+            logger.exception("Warm-up failed")
+        finally:
+            self.ready.set()
+
+
+startup_warmup = StartupWarmup(LinkCache(redis_client, local_link_cache) if settings.LINK_CACHE_ENABLED else None)
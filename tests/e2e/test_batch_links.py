@@ -0,0 +1,74 @@
+import json
+
+import httpx
+
+from tests.conftest import generate_random_string
+
+
+def read_results(response: httpx.Response) -> list:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_create_links_batch(test_client: httpx.Client):
+    """Test creating several links in one request"""
+    alias = generate_random_string(10)
+
+    response = test_client.post(
+        "/api/v1/links/shorten/batch",
+        json=[
+            {"original_url": "https://example.com/batch/1"},
+            {"original_url": "https://example.com/batch/2", "custom_alias": alias},
+            {"original_url": "https://example.com/batch/3"},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = read_results(response)
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert all(result["status"] == 201 for result in results)
+    assert results[1]["link"]["short_code"] == alias
+
+    redirect_response = test_client.get(f"/api/v1/links/{alias}", follow_redirects=False)
+    assert redirect_response.status_code == 307
+    assert redirect_response.headers["location"] == "https://example.com/batch/2"
+
+
+def test_create_links_batch_reports_item_errors(test_client: httpx.Client):
+    """Test that invalid items and duplicate aliases fail individually"""
+    alias = generate_random_string(10)
+
+    response = test_client.post(
+        "/api/v1/links/shorten/batch",
+        json=[
+            {"original_url": "https://example.com/batch/ok"},
+            {"original_url": "not-a-valid-url"},
+            {"original_url": "https://example.com/batch/first", "custom_alias": alias},
+            {"original_url": "https://example.com/batch/second", "custom_alias": alias},
+        ],
+    )
+
+    assert response.status_code == 200
+    statuses = [result["status"] for result in read_results(response)]
+    assert statuses == [201, 422, 201, 409]
+
+
+def test_create_links_batch_ndjson(test_client: httpx.Client):
+    """Test sending batch items as NDJSON"""
+    body = "\n".join(json.dumps({"original_url": f"https://example.com/ndjson/{i}"}) for i in range(5))
+
+    response = test_client.post(
+        "/api/v1/links/shorten/batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    results = read_results(response)
+    assert len(results) == 5
+    assert len({result["link"]["short_code"] for result in results}) == 5
+
+
+def test_create_links_batch_invalid_body(test_client: httpx.Client):
+    """Test that a body that is neither a JSON array nor NDJSON is rejected"""
+    response = test_client.post("/api/v1/links/shorten/batch", json={"original_url": "https://example.com"})
+
+    assert response.status_code == 422
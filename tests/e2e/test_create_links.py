@@ -89,3 +89,21 @@ def test_create_link_with_invalid_alias(test_client: httpx.Client):
     )
 
     assert response.status_code == 422
+
+
+def test_create_link_reuse_existing(test_client: httpx.Client):
+    """Test that reuse_existing returns an existing generated link for an equivalent URL"""
+    original_url = f"https://example.com/reuse/{datetime.datetime.now().timestamp()}"
+
+    first_response = test_client.post("/api/v1/links/shorten", json={"original_url": original_url})
+    assert first_response.status_code == 201
+
+    reused_response = test_client.post(
+        "/api/v1/links/shorten", json={"original_url": f"{original_url}/", "reuse_existing": True}
+    )
+    assert reused_response.status_code == 201
+    assert reused_response.json()["short_code"] == first_response.json()["short_code"]
+
+    new_response = test_client.post("/api/v1/links/shorten", json={"original_url": original_url})
+    assert new_response.status_code == 201
+    assert new_response.json()["short_code"] != first_response.json()["short_code"]
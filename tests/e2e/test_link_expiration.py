@@ -58,3 +58,15 @@ def test_create_link_with_past_expiration(test_client: httpx.Client):
     )
 
     assert response.status_code == 422
+
+
+def test_list_expired_links(test_client: httpx.Client):
+    """Test browsing the history of expired links"""
+    response = test_client.get("/api/v1/links/expired", params={"limit": 1})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["links"]) <= 1
+    for link in data["links"]:
+        assert link["expired_at"] is not None
+        assert link["visit_count"] >= 0
@@ -1,3 +1,5 @@
+import time
+
 import httpx
 
 
@@ -41,3 +43,55 @@ def test_stats_for_nonexistent_link(test_client: httpx.Client):
     """Test getting statistics for a nonexistent link"""
     stats_response = test_client.get("/api/v1/links/nonexistent/stats")
     assert stats_response.status_code == 404
+
+
+def test_stats_first_and_last_visit(test_client: httpx.Client, create_test_link):
+    """Test that statistics report the first and last visit times"""
+    short_code = create_test_link["short_code"]
+
+    initial_stats = test_client.get(f"/api/v1/links/{short_code}/stats").json()
+    assert initial_stats["visit_count"] == 0
+    assert initial_stats["first_visited_at"] is None
+    assert initial_stats["last_visited_at"] is None
+
+    for _ in range(2):
+        test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    stats = test_client.get(f"/api/v1/links/{short_code}/stats").json()
+    assert stats["visit_count"] == 2
+    assert stats["last_visited_at"] is not None
+
+
+def test_stats_etag(test_client: httpx.Client, create_test_link):
+    """Test that unchanged statistics are answered with 304 Not Modified"""
+    short_code = create_test_link["short_code"]
+
+    stats_response = test_client.get(f"/api/v1/links/{short_code}/stats")
+    etag = stats_response.headers["etag"]
+
+    not_modified_response = test_client.get(f"/api/v1/links/{short_code}/stats", headers={"If-None-Match": etag})
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.headers["etag"] == etag
+
+    test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    modified_response = test_client.get(f"/api/v1/links/{short_code}/stats", headers={"If-None-Match": etag})
+    assert modified_response.status_code == 200
+    assert modified_response.headers["etag"] != etag
+
+
+def test_stats_unique_visitors(test_client: httpx.Client, create_test_link):
+    """Test that repeated visits from one client count as one unique visitor"""
+    short_code = create_test_link["short_code"]
+
+    for _ in range(3):
+        test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    time.sleep(1)
+
+    stats = test_client.get(f"/api/v1/links/{short_code}/stats").json()
+    assert stats["visit_count"] == 3
+    assert stats["unique_visitors"] == 1
+
+    timeseries = test_client.get(f"/api/v1/links/{short_code}/stats/timeseries").json()
+    assert sum(bucket["unique_visitors"] for bucket in timeseries["buckets"]) == 1
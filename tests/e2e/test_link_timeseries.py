@@ -0,0 +1,55 @@
+import time
+
+import httpx
+
+
+def test_timeseries_counts_visits(test_client: httpx.Client, create_test_link):
+    """Test that hourly visit counts include recent visits"""
+    short_code = create_test_link["short_code"]
+
+    for _ in range(3):
+        test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    time.sleep(1)
+
+    response = test_client.get(f"/api/v1/links/{short_code}/stats/timeseries")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["short_code"] == short_code
+    assert data["granularity"] == "hour"
+    assert len(data["buckets"]) == 24
+    assert sum(bucket["visit_count"] for bucket in data["buckets"]) == 3
+
+
+def test_timeseries_daily_granularity(test_client: httpx.Client, create_test_link):
+    """Test requesting daily buckets for an explicit range"""
+    short_code = create_test_link["short_code"]
+
+    response = test_client.get(
+        f"/api/v1/links/{short_code}/stats/timeseries",
+        params={"start": "2025-01-01T00:00:00Z", "end": "2025-01-08T00:00:00Z", "granularity": "day"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["buckets"]) == 7
+    assert all(bucket["visit_count"] == 0 for bucket in data["buckets"])
+
+
+def test_timeseries_invalid_range(test_client: httpx.Client, create_test_link):
+    """Test that a range ending before it starts is rejected"""
+    short_code = create_test_link["short_code"]
+
+    response = test_client.get(
+        f"/api/v1/links/{short_code}/stats/timeseries",
+        params={"start": "2025-01-08T00:00:00Z", "end": "2025-01-01T00:00:00Z"},
+    )
+
+    assert response.status_code == 422
+
+
+def test_timeseries_for_nonexistent_link(test_client: httpx.Client):
+    """Test getting a timeseries for a nonexistent link"""
+    response = test_client.get("/api/v1/links/nonexistent/stats/timeseries")
+    assert response.status_code == 404
@@ -0,0 +1,26 @@
+import httpx
+
+
+def test_metrics_exposes_request_latency(test_client: httpx.Client, create_test_link):
+    """Test that served requests show up in the metrics by route template"""
+    short_code = create_test_link["short_code"]
+    test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/api/v1/links/{short_code}",status="307"}' in response.text
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert "db_query_duration_seconds_count" in response.text
+    assert 'visit_buffer{stat="depth"}' in response.text
+
+
+def test_metrics_counts_short_code_filter_lookups(test_client: httpx.Client):
+    """Test that looking up an unknown short code goes through the short code filter"""
+    response = test_client.get("/api/v1/links/nofilter404", follow_redirects=False)
+    assert response.status_code == 404
+
+    response = test_client.get("/metrics")
+
+    assert "short_code_filter_lookups_total{result=" in response.text
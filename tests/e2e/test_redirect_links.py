@@ -47,3 +47,53 @@ def test_redirect_custom_alias(test_client: httpx.Client, create_custom_link):
 
     assert response.status_code == 307
     assert response.headers["location"] == "https://example.com/custom"
+
+
+def test_redirect_with_origin_header(test_client: httpx.Client, create_test_link):
+    """Test that cross-origin redirects behave the same and carry CORS headers"""
+    short_code = create_test_link["short_code"]
+
+    plain_response = test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+    cors_response = test_client.get(
+        f"/api/v1/links/{short_code}", headers={"Origin": "https://example.org"}, follow_redirects=False
+    )
+
+    assert cors_response.status_code == plain_response.status_code
+    assert cors_response.headers["location"] == plain_response.headers["location"]
+    assert "access-control-allow-origin" in cors_response.headers
+
+
+def test_redirect_reserved_paths_not_treated_as_codes(test_client: httpx.Client):
+    """Test that fixed routes next to /links/{short_code} are not served as redirects"""
+    response = test_client.get("/api/v1/links/expired", follow_redirects=False)
+
+    assert response.status_code == 200
+
+
+def test_permanent_redirect_is_cacheable(test_client: httpx.Client):
+    """Test that permanent links redirect with their status code and can be cached but not edited"""
+    create_response = test_client.post(
+        "/api/v1/links/shorten", json={"original_url": "https://example.com/permanent", "redirect_type": 308}
+    )
+    assert create_response.status_code == 201
+    short_code = create_response.json()["short_code"]
+    assert create_response.json()["redirect_type"] == 308
+
+    response = test_client.get(f"/api/v1/links/{short_code}", follow_redirects=False)
+
+    assert response.status_code == 308
+    assert response.headers["location"] == "https://example.com/permanent"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert "expires" in response.headers
+
+    update_response = test_client.put(
+        f"/api/v1/links/{short_code}", json={"original_url": "https://example.com/changed"}
+    )
+    assert update_response.status_code == 409
+
+
+def test_temporary_redirect_is_not_cached(test_client: httpx.Client, create_test_link):
+    """Test that editable links are revalidated on every click by default"""
+    response = test_client.get(f"/api/v1/links/{create_test_link['short_code']}", follow_redirects=False)
+
+    assert response.headers["cache-control"] == "no-cache"
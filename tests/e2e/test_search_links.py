@@ -1,5 +1,7 @@
 import httpx
 
+from tests.conftest import generate_random_string
+
 
 def test_search_by_original_url(test_client: httpx.Client):
     """Test searching for links by original URL"""
@@ -38,3 +40,61 @@ def test_search_with_invalid_url(test_client: httpx.Client):
     search_response = test_client.get("/api/v1/links/search", params={"original_url": "not-a-valid-url"})
 
     assert search_response.status_code == 422
+
+
+def test_search_normalizes_url(test_client: httpx.Client):
+    """Test that searching matches URLs that differ only in case, default port, slashes and parameter order"""
+    test_client.post("/api/v1/links/shorten", json={"original_url": "https://example.com/normalized/?b=2&a=1"})
+
+    search_response = test_client.get(
+        "/api/v1/links/search", params={"original_url": "HTTPS://EXAMPLE.com:443/normalized?a=1&b=2"}
+    )
+
+    assert search_response.status_code == 200
+    assert len(search_response.json()["links"]) >= 1
+
+
+def test_search_by_domain_with_pagination(test_client: httpx.Client):
+    """Test paging through links of one domain with a cursor"""
+    domain = f"{generate_random_string(10).lower()}.example.com"
+    for i in range(5):
+        test_client.post("/api/v1/links/shorten", json={"original_url": f"https://{domain}/page/{i}"})
+
+    short_codes = []
+    cursor = None
+    while True:
+        params = {"domain": domain, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        search_response = test_client.get("/api/v1/links/search", params=params)
+        assert search_response.status_code == 200
+        search_data = search_response.json()
+        assert len(search_data["links"]) <= 2
+        short_codes.extend(link["short_code"] for link in search_data["links"])
+        cursor = search_data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(short_codes) == 5
+    assert len(set(short_codes)) == 5
+
+
+def test_search_by_prefix(test_client: httpx.Client):
+    """Test searching for links by URL prefix"""
+    domain = f"{generate_random_string(10).lower()}.example.com"
+    test_client.post("/api/v1/links/shorten", json={"original_url": f"https://{domain}/docs/a"})
+    test_client.post("/api/v1/links/shorten", json={"original_url": f"https://{domain}/docs/b"})
+    test_client.post("/api/v1/links/shorten", json={"original_url": f"https://{domain}/blog/c"})
+
+    search_response = test_client.get("/api/v1/links/search", params={"prefix": f"https://{domain.upper()}/docs/"})
+
+    assert search_response.status_code == 200
+    urls = {link["original_url"] for link in search_response.json()["links"]}
+    assert urls == {f"https://{domain}/docs/a", f"https://{domain}/docs/b"}
+
+
+def test_search_without_filters(test_client: httpx.Client):
+    """Test that a search needs at least one filter"""
+    search_response = test_client.get("/api/v1/links/search")
+
+    assert search_response.status_code == 422